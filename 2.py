@@ -29,17 +29,14 @@ def select_points(event, x, y, flags, param):
 # Para guardar las coordenadas de los espacios en un solo archivo
 def save_parking_spaces(spaces, filename='CarParkPos.pkl'):
     filepath = os.path.join(script_dir, filename)
-    with open(filepath, 'wb') as f:  # Guardar en un solo archivo
+    # Escribir en un archivo temporal y reemplazar de una vez, para que los detectores
+    # que recargan las posiciones nunca lean un archivo a medio escribir
+    tmp_path = filepath + '.tmp'
+    with open(tmp_path, 'wb') as f:  # Guardar en un solo archivo
         pickle.dump(spaces, f)
+    os.replace(tmp_path, filepath)
     print(f"Espacios guardados en {filepath}")
 
-# Para guardar el estado de los espacios (libre/ocupado) en un archivo .pkl
-def save_spaces_status(status, filename='spaces_status.pkl'):
-    filepath = os.path.join(script_dir, filename)
-    with open(filepath, 'wb') as f:  # Guardar en binario
-        pickle.dump(status, f)
-    print(f"Estado de los espacios guardado en {filepath}")
-
 # Para guardar la imagen capturada
 def save_image(image, filename='parking_image.jpg'):
     filepath = os.path.join(script_dir, filename)
@@ -81,12 +78,9 @@ if image_captured:
 
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):
-            save_parking_spaces(parking_spaces)  # Guardar todos los espacios en un solo archivo
-
-            # Guardar el estado de los espacios (libres/ocupados) en el archivo .pkl
-            # Aquí guardamos el estado inicial como todos libres (True = libre)
-            initial_status = {tuple(space): True for space in parking_spaces}
-            save_spaces_status(initial_status)
+            # Guardar todos los espacios en un solo archivo; main5.py, único escritor del canal
+            # de estado, los recarga y publica el estado de los espacios nuevos
+            save_parking_spaces(parking_spaces)
 
             break
 
@@ -0,0 +1,124 @@
+import argparse
+import csv
+import os
+import time
+import cv2
+from detector import VEHICLE_CLASSES, load_detector, vehicle_classes
+from occupancy import SpaceLayout, box_centers
+
+# Análisis por lotes sin ventana: recorre videos grabados o carpetas de imágenes
+# (como parking_image.jpg), pasa los fotogramas por YOLO en lotes y escribe la serie de
+# tiempo de ocupación en un CSV. Sirve para auditorías y para rellenar datos históricos.
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+# Generar (origen, índice, segundo, fotograma) a partir de un video
+def video_frames(path, stride=1):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        print(f"Error: No se pudo abrir el video '{path}'.")
+        return
+    index = 0
+    try:
+        while True:
+            # grab() sin decodificar los fotogramas que se saltan
+            if not cap.grab():
+                break
+            if index % stride == 0:
+                success, img = cap.retrieve()
+                if not success:
+                    break
+                yield path, index, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000, img
+            index += 1
+    finally:
+        cap.release()
+
+
+# Generar (origen, índice, segundo, fotograma) a partir de una lista de imágenes
+def image_frames(paths, stride=1):
+    for index, path in enumerate(paths[::stride]):
+        img = cv2.imread(path)
+        if img is None:
+            print(f"Error: No se pudo leer la imagen '{path}'.")
+            continue
+        yield path, index * stride, os.path.getmtime(path), img
+
+
+# Recorrer las entradas: videos, imágenes sueltas o carpetas de imágenes
+def iter_frames(inputs, stride=1):
+    for path in inputs:
+        if os.path.isdir(path):
+            names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+            yield from image_frames([os.path.join(path, n) for n in names], stride)
+        elif path.lower().endswith(VIDEO_EXTENSIONS):
+            yield from video_frames(path, stride)
+        else:
+            yield from image_frames([path])
+
+
+# Agrupar los fotogramas en lotes del tamaño indicado
+def batched(frames, batch_size):
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def analyze(inputs, positions_filename, output_filename, model_name='yolov8m.pt',
+            batch_size=8, stride=1, classes=(2,), conf=0.25, backend='torch', imgsz=640, max_det=300):
+    detector = load_detector(model_name, backend, imgsz=imgsz, max_det=max_det)
+    layout = SpaceLayout(positions_filename)
+    n_spaces = len(layout.pos_list)
+
+    processed = 0
+    start = time.perf_counter()
+    with open(output_filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['origen', 'fotograma', 'tiempo', 'libres', 'ocupados']
+                        + [f'espacio_{i + 1}' for i in range(n_spaces)])
+
+        for batch in batched(iter_frames(inputs, stride), batch_size):
+            detections = detector.detect([img for _, _, _, img in batch], classes=classes, conf=conf)
+            for (source, index, timestamp, img), dets in zip(batch, detections):
+                occupied = layout.occupancy(box_centers(dets[:, :4]), img.shape)
+                n_occupied = int(occupied.sum())
+                writer.writerow([source, index, f'{timestamp:.3f}', n_spaces - n_occupied, n_occupied]
+                                + occupied.astype(int).tolist())
+
+            processed += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"{processed} fotogramas, {processed / elapsed:.1f} fps")
+
+    elapsed = time.perf_counter() - start
+    print(f"Listo: {processed} fotogramas en {elapsed:.1f} s ({processed / max(elapsed, 1e-9):.1f} fps). "
+          f"Resultados en {output_filename}")
+    return processed
+
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Análisis de ocupación sobre videos o carpetas de imágenes")
+    parser.add_argument('inputs', nargs='+', help="Videos, imágenes o carpetas de imágenes")
+    parser.add_argument('--positions', default=os.path.join(script_dir, 'CarParkPos.pkl'))
+    parser.add_argument('--output', default='occupancy.csv')
+    parser.add_argument('--model', default='yolov8m.pt')
+    parser.add_argument('--backend', default='torch', choices=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--stride', type=int, default=1, help="Analizar uno de cada N fotogramas")
+    parser.add_argument('--classes', nargs='+', default=['car'], choices=list(VEHICLE_CLASSES),
+                        help="Clases de vehículos a detectar")
+    parser.add_argument('--imgsz', type=int, default=640, help="Tamaño de entrada del modelo")
+    parser.add_argument('--max-det', type=int, default=300, help="Máximo de detecciones por imagen")
+    parser.add_argument('--conf', type=float, default=0.25)
+    args = parser.parse_args()
+
+    analyze(args.inputs, args.positions, args.output, args.model,
+            args.batch_size, args.stride, vehicle_classes(args.classes), args.conf, args.backend,
+            args.imgsz, args.max_det)
@@ -0,0 +1,91 @@
+import argparse
+import time
+import cv2
+import numpy as np
+from occupancy import build_polygons, check_occupancy, build_overlap_tables, check_overlap_occupancy
+
+# Benchmark: comparar el ciclo original de checkSpaces (pointPolygonTest por cada par
+# espacio/auto) contra el motor vectorizado de occupancy.py.
+
+
+# Generar un estacionamiento sintético: filas de espacios inclinados de 4 puntos
+def synthetic_lot(n_spaces, width=60, height=110, skew=12, per_row=40):
+    pos_list = []
+    for i in range(n_spaces):
+        row, col = divmod(i, per_row)
+        x = 10 + col * (width + 6)
+        y = 10 + row * (height + 20)
+        pos_list.append([(x, y), (x + skew, y + height), (x + width + skew, y + height), (x + width, y)])
+    return pos_list
+
+
+# Generar cajas de autos aleatorias alrededor de los espacios
+def synthetic_boxes(pos_list, n_boxes, seed=0):
+    rng = np.random.default_rng(seed)
+    polygons = build_polygons(pos_list)
+    picks = rng.integers(0, len(pos_list), n_boxes)
+    centers = polygons[picks].mean(axis=1) + rng.normal(0, 25, (n_boxes, 2))
+    half = rng.uniform(20, 50, (n_boxes, 2))
+    return np.hstack([centers - half, centers + half]).astype(np.float32)
+
+
+# Versión original: un pointPolygonTest por cada par (espacio, auto)
+def loop_occupancy(pos_list, boxes):
+    occupied = []
+    for pos in pos_list:
+        polygon = np.array(pos, np.int32).reshape((-1, 1, 2))
+        detected_car = False
+        for box in boxes:
+            x1, y1, x2, y2 = map(int, box)
+            center_x = (x1 + x2) // 2
+            center_y = (y1 + y2) // 2
+            if cv2.pointPolygonTest(polygon, (center_x, center_y), False) >= 0:
+                detected_car = True
+        occupied.append(detected_car)
+    return np.array(occupied, bool)
+
+
+# Versión vectorizada: centros en un arreglo y polígonos precalculados
+def vectorized_occupancy(polygons, boxes):
+    coords = boxes.astype(np.int64)
+    centers = np.stack([(coords[:, 0] + coords[:, 2]) // 2, (coords[:, 1] + coords[:, 3]) // 2], axis=1)
+    return check_occupancy(centers, polygons)
+
+
+# Medir el tiempo promedio por fotograma de una función en milisegundos
+def time_per_frame(fn, repeats):
+    fn()  # Calentamiento
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de ocupación por fotograma")
+    parser.add_argument('--spaces', type=int, default=300)
+    parser.add_argument('--boxes', type=int, default=150)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    pos_list = synthetic_lot(args.spaces)
+    boxes = synthetic_boxes(pos_list, args.boxes)
+    polygons = build_polygons(pos_list)
+
+    # Verificar que ambos métodos den el mismo resultado
+    expected = loop_occupancy(pos_list, boxes)
+    result = vectorized_occupancy(polygons, boxes)
+    assert np.array_equal(expected, result), "El motor vectorizado no coincide con el ciclo original"
+
+    loop_ms = time_per_frame(lambda: loop_occupancy(pos_list, boxes), max(1, args.repeats // 4))
+    vec_ms = time_per_frame(lambda: vectorized_occupancy(polygons, boxes), args.repeats)
+
+    print(f"Espacios: {args.spaces}, autos: {args.boxes}, ocupados: {int(result.sum())}")
+    print(f"Ciclo original:   {loop_ms:8.3f} ms/fotograma")
+    print(f"Vectorizado:      {vec_ms:8.3f} ms/fotograma")
+    print(f"Aceleración:      {loop_ms / vec_ms:8.1f}x")
+
+    # Modo por superposición: matriz completa espacios x autos en un solo paso
+    tables = build_overlap_tables(polygons)
+    overlap_ms = time_per_frame(lambda: check_overlap_occupancy(boxes, tables), args.repeats)
+    print(f"Superposición:    {overlap_ms:8.3f} ms/fotograma")
@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import pickle
+import platform
+import subprocess
+import tempfile
+import time
+import cv2
+import numpy as np
+from bench_occupancy import synthetic_lot, synthetic_boxes
+from batch_analysis import iter_frames
+from detector import load_detector
+from lots import ParkingLot
+from occupancy import box_centers, build_polygons
+from profiling import Profiler
+from render import SpaceRenderer
+from status_channel import StatusWriter
+
+# Benchmark reproducible del camino detección -> ocupación: mide por separado cada etapa
+# (inferencia, asignación a espacios, actualización del estado, dibujo y publicación) sobre
+# estacionamientos sintéticos de 10 a 2000 espacios o sobre fotogramas grabados con su
+# CarParkPos.pkl, y guarda los resultados en JSON para comparar entre commits.
+#
+#   python bench_pipeline.py --sizes 10 100 500 2000 --output bench.json
+#   python bench_pipeline.py --inputs video.mp4 --positions CarParkPos.pkl --output bench.json
+#   python bench_pipeline.py --compare bench_anterior.json
+
+STAGES = ('inference', 'matching', 'state_update', 'render', 'publish')
+
+
+# Dibujo de referencia: el que hacía checkSpaces en main5.py antes de la capa en caché
+def render_spaces(img, pos_list, occupied, start_times, now):
+    for i, pos in enumerate(pos_list):
+        polygon = np.array(pos, np.int32).reshape((-1, 1, 2))
+        color = (0, 0, 200) if occupied[i] else (0, 200, 0)
+        if not np.isnan(start_times[i]):
+            hours, rem = divmod(now - start_times[i], 3600)
+            minutes, seconds = divmod(rem, 60)
+            cv2.putText(img, f'{int(hours):02}:{int(minutes):02}:{int(seconds):02}',
+                        (polygon[0][0][0], polygon[0][0][1] - 10), cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255), 2)
+        cv2.polylines(img, [polygon], isClosed=True, color=color, thickness=1)
+        cv2.putText(img, f'{i + 1}', (polygon[2][0][0] - 40, polygon[2][0][1] - 10),
+                    cv2.FONT_HERSHEY_PLAIN, 2, (255, 255, 255), 2)
+    return img
+
+
+# Detecciones (M, 6) sintéticas para un fotograma: cajas alrededor de los espacios
+def synthetic_detections(pos_list, n_boxes, seed):
+    boxes = synthetic_boxes(pos_list, n_boxes, seed)
+    rng = np.random.default_rng(seed)
+    conf = rng.uniform(0.3, 0.95, (len(boxes), 1))
+    return np.hstack([boxes, conf, np.full((len(boxes), 1), 2)]).astype(np.float32)
+
+
+# Secuencia de detecciones (M, 6) de un estacionamiento con autos quietos: la mitad de los
+# espacios con un auto que se mueve unos píxeles entre fotogramas y, en cada fotograma, una
+# fracción `turnover` de los espacios que cambia (un auto que se va o uno que llega)
+def parked_detections(pos_list, n_frames, seed=0, turnover=0.01):
+    rng = np.random.default_rng(seed)
+    centers = build_polygons(pos_list).mean(axis=1)
+    half = rng.uniform(20, 35, (len(pos_list), 2))
+    parked = rng.random(len(pos_list)) < 0.5
+    sequence = []
+    for _ in range(n_frames):
+        parked ^= rng.random(len(pos_list)) < turnover
+        index = np.flatnonzero(parked)
+        jitter = rng.normal(0, 2, (len(index), 2))
+        boxes = np.hstack([centers[index] + jitter - half[index], centers[index] + jitter + half[index]])
+        conf = rng.uniform(0.4, 0.95, (len(index), 1))
+        sequence.append(np.hstack([boxes, conf, np.full((len(index), 1), 2)]).astype(np.float32))
+    return sequence
+
+
+# Fotograma de fondo del tamaño justo para contener el estacionamiento sintético
+def synthetic_frame(pos_list, seed=0):
+    points = np.array(pos_list).reshape(-1, 2)
+    width, height = points.max(axis=0) + 20
+    rng = np.random.default_rng(seed)
+    return rng.integers(60, 120, (height, width, 3), dtype=np.uint8)
+
+
+# Correr el camino completo sobre los fotogramas y medir cada etapa
+def run_case(name, positions_filename, frames, detector, work_dir, warmup=1, reference_render=False):
+    lot = ParkingLot(name, positions_filename, smoothing={})
+    renderer = SpaceRenderer(lot.layout.pos_list, frames[0].shape)
+    status = StatusWriter(os.path.join(work_dir, f'status_{name}.bin'))
+    profiler = Profiler(window=len(frames), report_every=None)
+    n_boxes = 0
+    try:
+        for index, img in enumerate(frames):
+            # Los primeros fotogramas construyen cachés (mapa de etiquetas) y no se cuentan
+            if index == warmup:
+                profiler.stats.clear()
+                n_boxes = 0
+            now = 1000.0 + index * 0.1  # 10 fotogramas por segundo
+            with profiler.stage('inference'):
+                dets = detector.detect(img, conf=0.25)[0]
+            with profiler.stage('matching'):
+                confidence = lot.layout.occupancy_confidence(box_centers(dets[:, :4]), dets[:, 4], img.shape)
+            with profiler.stage('state_update'):
+                lot.update(lot.observe(confidence), now)
+            canvas = img.copy()
+            with profiler.stage('render'):
+                if reference_render:
+                    render_spaces(canvas, lot.layout.pos_list, lot.occupied, lot.start_times, now)
+                else:
+                    renderer.draw(canvas, lot.occupied, lot.start_times, now)
+            with profiler.stage('publish'):
+                status.publish(lot.occupied, lot.start_times, confidence)
+            n_boxes += len(dets)
+    finally:
+        status.close()
+
+    summary = profiler.summary()
+    return {
+        'case': name,
+        'n_spaces': lot.n_spaces,
+        'frames': len(frames) - warmup,
+        'mean_boxes': n_boxes / max(len(frames) - warmup, 1),
+        'stages': {stage: summary[stage] for stage in STAGES if stage in summary},
+        'total_mean_ms': sum(summary[stage]['mean_ms'] for stage in STAGES if stage in summary),
+    }
+
+
+# Caso sintético: n_spaces espacios, la mitad con un auto y pocas llegadas o salidas por fotograma
+def synthetic_case(n_spaces, n_frames, work_dir, seed=0, reference_render=False):
+    pos_list = synthetic_lot(n_spaces)
+    filename = os.path.join(work_dir, f'pos_{n_spaces}.pkl')
+    with open(filename, 'wb') as f:
+        pickle.dump(pos_list, f)
+    detections = parked_detections(pos_list, n_frames + 1, seed)
+    frame = synthetic_frame(pos_list, seed)
+    calls = {'n': 0}
+
+    # Detector falso que devuelve las detecciones precalculadas del fotograma en curso
+    def next_detections(img):
+        dets = detections[calls['n'] % len(detections)]
+        calls['n'] += 1
+        return dets
+
+    detector = load_detector(backend='fake', fn=next_detections, max_det=max(300, n_spaces))
+    return run_case(f'sintetico_{n_spaces}', filename, [frame] * (n_frames + 1), detector, work_dir,
+                    reference_render=reference_render)
+
+
+# Caso grabado: fotogramas reales con las posiciones dadas; detecciones del detector indicado
+# o, con el detector falso, cajas sintéticas alrededor de los espacios
+def recorded_case(inputs, positions_filename, n_frames, work_dir, model='yolov8m.pt', backend='fake', seed=0,
+                  reference_render=False):
+    frames = [img for _, _, _, img in iter_frames(inputs)][:n_frames + 1]
+    if not frames:
+        raise ValueError("No se pudo leer ningún fotograma de las entradas")
+    if backend == 'fake':
+        with open(positions_filename, 'rb') as f:
+            pos_list = pickle.load(f)
+        rng = np.random.default_rng(seed)
+        detector = load_detector(backend='fake', fn=lambda img: synthetic_detections(
+            pos_list, max(1, len(pos_list) // 2), int(rng.integers(1 << 31))))
+    else:
+        detector = load_detector(model, backend)
+    return run_case(os.path.basename(inputs[0]), positions_filename, frames, detector, work_dir,
+                    reference_render=reference_render)
+
+
+# Datos del entorno para poder comparar resultados entre máquinas y commits
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def print_results(results):
+    print(f"{'caso':<20}{'espacios':>9}" + ''.join(f"{stage:>14}" for stage in STAGES) + f"{'total':>10}")
+    for case in results:
+        stages = ''.join(f"{case['stages'][stage]['p50_ms']:>14.3f}" if stage in case['stages'] else f"{'-':>14}"
+                         for stage in STAGES)
+        print(f"{case['case']:<20}{case['n_spaces']:>9}{stages}{case['total_mean_ms']:>10.3f}")
+    print("(p50 en ms por etapa; total = suma de los promedios)")
+
+
+# Comparar con resultados anteriores: razón nuevo/anterior del p50 de cada etapa
+def print_comparison(results, previous):
+    old = {case['case']: case for case in previous['results']}
+    print(f"Comparación contra {previous['environment'].get('commit')} (razón p50 nuevo/anterior; < 1 es más rápido)")
+    for case in results:
+        before = old.get(case['case'])
+        if before is None:
+            continue
+        ratios = []
+        for stage in STAGES:
+            if stage in case['stages'] and stage in before['stages'] and before['stages'][stage]['p50_ms'] > 0:
+                ratios.append(f"{stage} {case['stages'][stage]['p50_ms'] / before['stages'][stage]['p50_ms']:.2f}")
+        print(f"{case['case']:<20}" + ', '.join(ratios))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark por etapas del camino detección -> ocupación")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[10, 100, 500, 2000],
+                        help="Cantidad de espacios de los estacionamientos sintéticos")
+    parser.add_argument('--frames', type=int, default=50, help="Fotogramas por caso")
+    parser.add_argument('--inputs', nargs='*', default=[], help="Videos o imágenes grabadas")
+    parser.add_argument('--positions', help="CarParkPos.pkl de los fotogramas grabados")
+    parser.add_argument('--model', default='yolov8m.pt')
+    parser.add_argument('--backend', default='fake', help="'fake' (detector falso) o un backend de detector.py")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reference-render', action='store_true',
+                        help="Medir el dibujo anterior (polylines/putText por espacio) en lugar de la capa en caché")
+    parser.add_argument('--output', help="Archivo JSON de resultados")
+    parser.add_argument('--compare', help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_spaces in args.sizes:
+            results.append(synthetic_case(n_spaces, args.frames, work_dir, args.seed, args.reference_render))
+        if args.inputs:
+            if not args.positions:
+                parser.error("--inputs necesita --positions")
+            results.append(recorded_case(args.inputs, args.positions, args.frames, work_dir,
+                                         args.model, args.backend, args.seed, args.reference_render))
+
+    print_results(results)
+    report = {'environment': environment(), 'frames': args.frames, 'seed': args.seed, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
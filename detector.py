@@ -0,0 +1,132 @@
+import os
+import shutil
+import numpy as np
+
+# Detectores intercambiables: todos devuelven, por cada imagen, un arreglo (M, 6) con
+# columnas x1, y1, x2, y2, confianza, clase. Así la lógica de ocupación no depende de
+# cómo se ejecuta el modelo (PyTorch, ONNX Runtime, OpenVINO o un detector falso).
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+
+# Clases de vehículos de COCO
+VEHICLE_CLASSES = {'car': 2, 'motorcycle': 3, 'bus': 5, 'truck': 7}
+
+
+# Índices de clase COCO a partir de nombres de vehículos ('car', 'truck', ...)
+def vehicle_classes(names):
+    return tuple(VEHICLE_CLASSES[name] for name in names)
+
+
+# Arreglo vacío con el formato de detecciones
+def empty_detections():
+    return np.zeros((0, 6), np.float32)
+
+
+# Detecciones (M, 6) cuya clase está en `classes`
+def detections_of_classes(detections, classes=None):
+    if classes is None:
+        return detections
+    return detections[np.isin(detections[:, 5].astype(np.int64), classes)]
+
+
+class Detector:
+    # Detectar en una imagen o lista de imágenes; devuelve una lista de arreglos (M, 6)
+    def detect(self, images, classes=None, conf=0.25):
+        raise NotImplementedError
+
+    def __call__(self, images, classes=None, conf=0.25):
+        return self.detect(images, classes, conf)
+
+
+# Nombre del modelo exportado en caché: incluye todo lo que fija la exportación (precisión,
+# tamaño de entrada y si acepta lotes y tamaños variables)
+def exported_path(weights, backend, half=False, int8=False, imgsz=640, dynamic=True):
+    stem = os.path.splitext(weights)[0]
+    suffix = '_int8' if int8 else '_fp16' if half else ''
+    suffix += f'_{imgsz}' + ('_dynamic' if dynamic else '')
+    if backend == 'onnx':
+        return f'{stem}{suffix}.onnx'
+    return f'{stem}{suffix}_openvino_model'
+
+
+# Exportar los pesos de PyTorch a ONNX u OpenVINO una sola vez y reutilizar la exportación
+# mientras sea más reciente que los pesos. Con dynamic el modelo exportado acepta lotes de
+# cualquier tamaño (server.py, batch_analysis.py y los recortes de roi.py detectan en lote);
+# sin él queda fijo en un lote de una imagen.
+def export_model(weights, backend, half=False, int8=False, imgsz=640, dynamic=True):
+    target = exported_path(weights, backend, half, int8, imgsz, dynamic)
+    if os.path.exists(target) and (not os.path.exists(weights)
+                                   or os.path.getmtime(target) >= os.path.getmtime(weights)):
+        return target
+
+    from ultralytics import YOLO
+    print(f"Exportando {weights} a {backend}...")
+    exported = YOLO(weights).export(format=backend, half=half, int8=int8, imgsz=imgsz, dynamic=dynamic)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        shutil.move(exported, target)
+    print(f"Modelo exportado: {target}")
+    return target
+
+
+# Detector basado en ultralytics; carga los pesos de PyTorch o un modelo exportado.
+# El filtro de clases, max_det y el tamaño de entrada se pasan al modelo, así el filtrado
+# y la NMS ocurren dentro de la inferencia y no en un ciclo de Python.
+class UltralyticsDetector(Detector):
+    def __init__(self, weights='yolov8m.pt', backend='torch', half=False, int8=False, imgsz=640, max_det=300):
+        from ultralytics import YOLO
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend desconocido '{backend}'. Opciones: {', '.join(BACKENDS)}")
+        if backend != 'torch':
+            weights = export_model(weights, backend, half, int8, imgsz)
+        self.weights = weights
+        self.backend = backend
+        self.imgsz = imgsz
+        self.max_det = max_det
+        self.model = YOLO(weights, task='detect')
+
+    def detect(self, images, classes=None, conf=0.25):
+        if not isinstance(images, (list, tuple)):
+            images = [images]
+        results = self.model(list(images), conf=conf, imgsz=self.imgsz, max_det=self.max_det,
+                             classes=None if classes is None else list(classes), verbose=False)
+
+        # boxes.data ya es un solo tensor (M, 6): x1, y1, x2, y2, confianza, clase
+        return [np.ascontiguousarray(result.boxes.data.cpu().numpy(), np.float32).reshape(-1, 6)
+                for result in results]
+
+
+# Detector falso para probar la lógica de ocupación sin pesos: devuelve detecciones fijas
+# o las que genere una función fn(imagen) -> arreglo (M, 6)
+class FakeDetector(Detector):
+    def __init__(self, detections=None, fn=None, imgsz=640, max_det=300):
+        self.detections = empty_detections() if detections is None else np.asarray(detections, np.float32).reshape(-1, 6)
+        self.fn = fn
+        self.max_det = max_det
+        self.calls = 0
+
+    def detect(self, images, classes=None, conf=0.25):
+        if not isinstance(images, (list, tuple)):
+            images = [images]
+        self.calls += 1
+
+        detections = []
+        for img in images:
+            dets = self.detections if self.fn is None else np.asarray(self.fn(img), np.float32).reshape(-1, 6)
+            dets = dets[dets[:, 4] >= conf]
+            if classes is not None:
+                dets = dets[np.isin(dets[:, 5].astype(np.int64), classes)]
+            # Igual que el modelo: conservar las max_det detecciones de mayor confianza
+            dets = dets[np.argsort(-dets[:, 4], kind='stable')[:self.max_det]]
+            detections.append(np.ascontiguousarray(dets))
+        return detections
+
+
+# Crear el detector indicado: 'fake' para pruebas o uno de BACKENDS
+def load_detector(weights='yolov8m.pt', backend='torch', **kwargs):
+    if backend == 'fake':
+        return FakeDetector(**kwargs)
+    return UltralyticsDetector(weights, backend, **kwargs)
@@ -1,53 +1,147 @@
+import csv
 import mysql.connector
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill
 from openpyxl.utils import get_column_letter
 
-def generate_excel(file_path):
-    # Conectar a la base de datos
-    db_config = {
-        'user': 'root',
-        'password': 'mysql',
-        'host': 'localhost',
-        'database': 'parking_system'
-    }
-    conn = mysql.connector.connect(**db_config)
-    cursor = conn.cursor()
+# Conexión a la base de datos
+db_config = {
+    'user': 'root',
+    'password': 'mysql',
+    'host': 'localhost',
+    'database': 'parking_system'
+}
+
+HEADERS = ["ID", "Nro. Parqueo", "Llegada", "Salida", "Día", "Total (Bs)"]
+
+# Cantidad de filas que se traen del servidor en cada bloque
+CHUNK_SIZE = 5000
+
+
+# Consulta de parking_log con los filtros de fechas y espacios aplicados en el SQL
+def build_query(start_date=None, end_date=None, spaces=None, placeholder='%s', after_id=None):
+    query = "SELECT id, space_number, llegada, salida, fecha, total FROM parking_log"
+    conditions = []
+    params = []
+    if after_id is not None:
+        conditions.append(f"id > {placeholder}")
+        params.append(after_id)
+    if start_date is not None:
+        conditions.append(f"fecha >= {placeholder}")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append(f"fecha <= {placeholder}")
+        params.append(end_date)
+    if spaces:
+        conditions.append(f"space_number IN ({', '.join([placeholder] * len(spaces))})")
+        params.extend(spaces)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query + " ORDER BY id", params
 
-    # Consultar los datos de la base de datos
-    cursor.execute("SELECT id, space_number, llegada, salida, fecha, total FROM parking_log")
-    rows = cursor.fetchall()
 
-    # Crear un libro de trabajo Excel
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Parking Log"
+# Leer las filas del cursor por bloques, sin cargar toda la tabla en memoria
+def fetch_in_chunks(cursor, chunk_size=CHUNK_SIZE):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield from rows
 
-    # Agregar los encabezados
-    headers = ["ID", "Nro. Parqueo", "Llegada", "Salida", "Día", "Total (Bs)"]
-    ws.append(headers)
 
-    # Estilizar los encabezados
+# Agregar a un libro en modo solo escritura una hoja con encabezados estilizados y filtro;
+# las filas van directo al archivo. Devuelve la cantidad de filas.
+def write_sheet(wb, title, headers, rows):
+    ws = wb.create_sheet(title)
+
+    # Ajustar el ancho de las columnas
+    for col_num in range(1, len(headers) + 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = 20
+
+    # Agregar los encabezados estilizados
     header_fill = PatternFill(start_color="B4C6E7", end_color="B4C6E7", fill_type="solid")
     header_font = Font(bold=True)
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num)
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
         cell.fill = header_fill
         cell.font = header_font
-        ws.column_dimensions[get_column_letter(col_num)].width = 20  # Ajustar el ancho de las columnas
         cell.alignment = Alignment(horizontal="center", vertical="center")
+        header_cells.append(cell)
+    ws.append(header_cells)
 
-    # Agregar los datos de la base de datos
+    # Agregar los datos
+    count = 0
     for row in rows:
         ws.append(row)
+        count += 1
 
     # Aplicar filtro en los encabezados
-    ws.auto_filter.ref = ws.dimensions
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(headers))}{count + 1}"
+    return count
 
-    # Guardar el archivo Excel en la ruta seleccionada
+
+# Escribir las filas en un Excel en modo solo escritura (las filas van directo al archivo).
+# extra_sheets: hojas adicionales como (título, encabezados, filas), después del registro.
+def write_excel(rows, file_path, extra_sheets=()):
+    wb = openpyxl.Workbook(write_only=True)
+    count = write_sheet(wb, "Parking Log", HEADERS, rows)
+    for title, headers, sheet_rows in extra_sheets:
+        write_sheet(wb, title, headers, sheet_rows)
     wb.save(file_path)
-    print(f"Archivo Excel generado: {file_path}")
+    return count
+
+
+# Escribir las filas en un CSV
+def write_csv(rows, file_path):
+    count = 0
+    with open(file_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+# Exportar parking_log a Excel (o CSV si la ruta termina en .csv). Las filas se traen del
+# servidor por bloques y se escriben a medida que llegan, así la memoria no depende del
+# tamaño de la tabla. start_date/end_date (fechas) y spaces (números de espacio) filtran
+# los registros en la consulta.
+def generate_excel(file_path, start_date=None, end_date=None, spaces=None, chunk_size=CHUNK_SIZE):
+    conn = mysql.connector.connect(**db_config)
+    # Cursor sin búfer: las filas se leen del servidor a medida que se piden
+    cursor = conn.cursor(buffered=False)
+
+    try:
+        query, params = build_query(start_date, end_date, spaces)
+        cursor.execute(query, params)
+        rows = fetch_in_chunks(cursor, chunk_size)
+
+        if file_path.lower().endswith('.csv'):
+            count = write_csv(rows, file_path)
+        else:
+            count = write_excel(rows, file_path)
+        print(f"Archivo generado: {file_path} ({count} registros)")
+    finally:
+        # Cerrar conexión
+        cursor.close()
+        conn.close()
+
+
+# Exportar desde la línea de comandos, con los mismos filtros que la consulta
+#
+#   python generate_excel.py reporte.xlsx --start-date 2024-05-01 --end-date 2024-05-31 --spaces 1 2 3
+if __name__ == "__main__":
+    import argparse
+    from datetime import date
 
-    # Cerrar conexión
-    cursor.close()
-    conn.close()
+    parser = argparse.ArgumentParser(description="Exportar parking_log a Excel o CSV")
+    parser.add_argument('file_path', help="Archivo de salida (.xlsx o .csv)")
+    parser.add_argument('--start-date', type=date.fromisoformat, help="Primer día (AAAA-MM-DD)")
+    parser.add_argument('--end-date', type=date.fromisoformat, help="Último día (AAAA-MM-DD)")
+    parser.add_argument('--spaces', type=int, nargs='*', help="Números de espacio")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    generate_excel(args.file_path, args.start_date, args.end_date, args.spaces, args.chunk_size)
@@ -1,9 +1,17 @@
 import cv2
-from ultralytics import YOLO
+from detector import load_detector
 
-# Cargar el modelo entrenado
-from ultralytics import YOLO
-model = YOLO('yolov8m.pt')  # Puedes usar la versión pequeña (yolov8n) o una más grande
+# Cargar el modelo entrenado ('onnx' u 'openvino' en DETECTOR_BACKEND para acelerar la CPU)
+DETECTOR_BACKEND = 'torch'
+detector = load_detector('yolov8m.pt', DETECTOR_BACKEND)  # Puedes usar la versión pequeña (yolov8n) o una más grande
+
+# Dibujar las cajas detectadas con su clase y confianza
+def draw_detections(img, detections):
+    for x1, y1, x2, y2, conf, cls in detections:
+        cv2.rectangle(img, (int(x1), int(y1)), (int(x2), int(y2)), (0, 200, 0), 2)
+        cv2.putText(img, f'{int(cls)} {conf:.2f}', (int(x1), int(y1) - 5),
+                    cv2.FONT_HERSHEY_PLAIN, 1, (0, 200, 0), 2)
+    return img
 
 
 
@@ -24,10 +32,10 @@ while True:
         break
 
     # Realizar inferencia en el cuadro capturado
-    results = model(frame)
+    detections = detector.detect(frame)[0]
 
     # Obtener el cuadro anotado con los bounding boxes
-    annotated_frame = results[0].plot()
+    annotated_frame = draw_detections(frame, detections)
 
     # Mostrar el cuadro con las detecciones
     cv2.imshow('Detección en tiempo real', annotated_frame)
@@ -0,0 +1,217 @@
+import csv
+import os
+import shutil
+import sqlite3
+import threading
+from datetime import datetime, date
+from generate_excel import HEADERS, CHUNK_SIZE, build_query, fetch_in_chunks, write_excel
+
+# Exportación incremental de parking_log: se recuerda el último `id` exportado (marca de
+# agua), cada sincronización trae solo las filas nuevas, las agrega al final de un CSV y
+# actualiza los agregados por día y por espacio (recaudación, minutos ocupados y rotación)
+# guardados en un SQLite local. El Excel se arma desde el CSV y esos agregados, sin volver
+# a leer todo el historial de la base.
+#
+# Los `id` se reservan al insertar pero las transacciones pueden confirmarse en otro orden
+# (dos escritores, o un lote largo), así que una fila con id menor a la marca puede aparecer
+# después de exportada la marca. Por eso cada sincronización vuelve a leer una ventana de
+# `overlap` ids por debajo de la marca y descarta las filas que ya se exportaron (los ids
+# de esa ventana se guardan en la tabla exported).
+
+CACHE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS watermark (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_id INTEGER NOT NULL,
+    last_salida TEXT,
+    csv_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_space (
+    fecha TEXT NOT NULL,
+    space_number INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    minutes REAL NOT NULL,
+    revenue REAL NOT NULL,
+    PRIMARY KEY (fecha, space_number)
+);
+CREATE TABLE IF NOT EXISTS exported (
+    id INTEGER PRIMARY KEY
+);
+'''
+
+UPSERT_SQL = '''INSERT INTO daily_space (fecha, space_number, sessions, minutes, revenue)
+                VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT (fecha, space_number) DO UPDATE SET
+                    sessions = sessions + 1,
+                    minutes = minutes + excluded.minutes,
+                    revenue = revenue + excluded.revenue'''
+
+
+def _as_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class IncrementalExporter:
+    # connect: función sin argumentos que devuelve la conexión a la base de datos de parking_log
+    # overlap: ids por debajo de la marca que se vuelven a leer en cada sincronización
+    def __init__(self, connect, cache_filename, csv_filename, placeholder='%s', chunk_size=CHUNK_SIZE,
+                 overlap=1000):
+        self.connect = connect
+        self.csv_filename = csv_filename
+        self.placeholder = placeholder
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.cache = sqlite3.connect(cache_filename, check_same_thread=False)
+        self.cache.executescript(CACHE_SCHEMA)
+        self.cache.execute("INSERT OR IGNORE INTO watermark (id, last_id, last_salida, csv_size) VALUES (1, 0, NULL, 0)")
+        self.cache.commit()
+
+    @property
+    def watermark(self):
+        last_id, last_salida, csv_size = self.cache.execute(
+            "SELECT last_id, last_salida, csv_size FROM watermark WHERE id = 1").fetchone()
+        return {'last_id': last_id, 'last_salida': last_salida, 'csv_size': csv_size}
+
+    # Deshacer lo que quedó escrito en el CSV después de la última sincronización confirmada
+    def _open_csv(self, csv_size):
+        if os.path.exists(self.csv_filename) and os.path.getsize(self.csv_filename) > csv_size:
+            with open(self.csv_filename, 'r+b') as f:
+                f.truncate(csv_size)
+        new_file = not os.path.exists(self.csv_filename) or csv_size == 0
+        f = open(self.csv_filename, 'a', newline='', encoding='utf-8')
+        if new_file:
+            f.truncate(0)
+            csv.writer(f).writerow(HEADERS)
+        return f
+
+    # Traer solo las filas nuevas (más la ventana de `overlap` ids bajo la marca), agregarlas
+    # al CSV y actualizar los agregados. Devuelve la cantidad de filas nuevas.
+    def sync(self):
+        mark = self.watermark
+        query, params = build_query(placeholder=self.placeholder, after_id=max(0, mark['last_id'] - self.overlap))
+
+        conn = self.connect()
+        cursor = conn.cursor()
+        count = 0
+        last_id, last_salida = mark['last_id'], mark['last_salida']
+        try:
+            cursor.execute(query, params)
+            with self._open_csv(mark['csv_size']) as f:
+                writer = csv.writer(f)
+                for row in fetch_in_chunks(cursor, self.chunk_size):
+                    row_id, space_number, llegada, salida, fecha, total = row
+                    if self.cache.execute("INSERT OR IGNORE INTO exported (id) VALUES (?)", (row_id,)).rowcount == 0:
+                        continue  # Ya exportada en una sincronización anterior
+                    writer.writerow(row)
+
+                    llegada, salida = _as_datetime(llegada), _as_datetime(salida)
+                    minutes = (salida - llegada).total_seconds() / 60 if salida is not None else 0.0
+                    self.cache.execute(UPSERT_SQL, (_as_date(fecha).isoformat(), space_number,
+                                                    minutes, float(total or 0)))
+                    last_id = max(last_id, row_id)
+                    if salida is not None:
+                        last_salida = salida.isoformat()
+                    count += 1
+                f.flush()
+                os.fsync(f.fileno())
+                csv_size = f.tell()
+        except Exception:
+            self.cache.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+        # Confirmar los agregados junto con la nueva marca de agua; los ids que ya quedaron
+        # fuera de la ventana no se vuelven a leer
+        self.cache.execute("UPDATE watermark SET last_id = ?, last_salida = ?, csv_size = ? WHERE id = 1",
+                           (last_id, last_salida, csv_size))
+        self.cache.execute("DELETE FROM exported WHERE id <= ?", (last_id - self.overlap,))
+        self.cache.commit()
+        return count
+
+    # Agregados por día: registros (rotación), minutos ocupados y recaudación
+    def daily_totals(self, start_date=None, end_date=None):
+        query = "SELECT fecha, SUM(sessions), SUM(minutes), SUM(revenue) FROM daily_space"
+        conditions, params = [], []
+        if start_date is not None:
+            conditions.append("fecha >= ?")
+            params.append(str(start_date))
+        if end_date is not None:
+            conditions.append("fecha <= ?")
+            params.append(str(end_date))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self.cache.execute(query + " GROUP BY fecha ORDER BY fecha", params).fetchall()
+
+    # Agregados por espacio
+    def space_totals(self):
+        return self.cache.execute('''SELECT space_number, SUM(sessions), SUM(minutes), SUM(revenue)
+                                     FROM daily_space GROUP BY space_number ORDER BY space_number''').fetchall()
+
+    # Filas del CSV local, con sus tipos (el CSV guarda todo como texto)
+    def rows(self):
+        with open(self.csv_filename, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Encabezados
+            for row_id, space_number, llegada, salida, fecha, total in reader:
+                yield (int(row_id), int(space_number), _as_datetime(llegada or None),
+                       _as_datetime(salida or None), _as_date(fecha), float(total) if total else None)
+
+    # Reporte en Excel: el registro completo (leído del CSV local, sin volver a consultar la
+    # base) y los agregados por día y por espacio en hojas aparte
+    def write_report(self, file_path):
+        totals = ["Registros", "Minutos ocupados", "Total (Bs)"]
+
+        def rounded(rows):
+            return ([key, sessions, round(minutes, 1), round(revenue, 2)] for key, sessions, minutes, revenue in rows)
+
+        return write_excel(self.rows(), file_path, extra_sheets=(
+            ("Por día", ["Día"] + totals, rounded(self.daily_totals())),
+            ("Por espacio", ["Nro. Parqueo"] + totals, rounded(self.space_totals()))))
+
+    def close(self):
+        self.cache.close()
+
+
+# Una sola exportación a la vez: comparten el caché y el CSV local
+export_lock = threading.Lock()
+
+
+# Sincronizar contra MySQL (solo las filas nuevas) y guardar el resultado: con una ruta .csv
+# se copia el registro completo acumulado en el CSV local; si no, el Excel con el registro
+# completo y los agregados por día y por espacio. Devuelve False si ya había otra
+# exportación en curso.
+def export_report(file_path, cache_dir=None):
+    import mysql.connector
+    from generate_excel import db_config
+
+    if not export_lock.acquire(blocking=False):
+        print("Ya hay una exportación en curso.")
+        return False
+    try:
+        cache_dir = cache_dir or os.path.dirname(os.path.abspath(__file__))
+        exporter = IncrementalExporter(lambda: mysql.connector.connect(**db_config),
+                                       os.path.join(cache_dir, 'export_cache.db'),
+                                       os.path.join(cache_dir, 'parking_log_export.csv'))
+        try:
+            new_rows = exporter.sync()
+            if file_path.lower().endswith('.csv'):
+                shutil.copyfile(exporter.csv_filename, file_path)
+            else:
+                exporter.write_report(file_path)
+            print(f"Archivo generado: {file_path} ({new_rows} registros nuevos desde la última exportación)")
+        finally:
+            exporter.close()
+    finally:
+        export_lock.release()
+    return True
@@ -1,12 +1,13 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog  # Importar filedialog para la selección de ruta de guardado
-import pickle
 import threading
 import subprocess
 import os
 import sys
-from generate_excel import generate_excel  # Importar la función para generar Excel
+import time
+from incremental_export import export_report  # Exportación incremental de parking_log
+from status_channel import StatusReader
 
 class ParkingInterface:
     def __init__(self, root):
@@ -15,7 +16,7 @@ class ParkingInterface:
         self.root.configure(background="darkslategrey")
 
         # Dimensiones de la ventana
-        window_dimensions = (400, 300)
+        window_dimensions = (520, 650)
 
         # Centrar la ventana en la pantalla
         self.center_window(*window_dimensions)
@@ -27,7 +28,8 @@ class ParkingInterface:
         # Obtener el directorio del script actual
         script_dir = os.path.dirname(os.path.abspath(__file__))
         self.main_program_path = os.path.join(script_dir, 'main5.py')
-        self.spaces_status_path = os.path.join(script_dir, 'spaces_status.pkl')
+        self.spaces_status_path = os.path.join(script_dir, 'spaces_status.bin')
+        self.status_reader = None
         self.SpacePicker_path = os.path.join(script_dir, '2.py')
 
         # Label para mostrar los espacios libres y ocupados
@@ -45,10 +47,20 @@ class ParkingInterface:
         self.space_picker_button = ttk.Button(self.frame, text="Space Picker", command=self.open_space_picker)
         self.space_picker_button.grid(row=3, column=0, padx=10, pady=10)
 
-        # Botón para generar el Excel
+        # Botón para generar el Excel (solo trae de la base de datos los registros nuevos)
         self.excel_button = ttk.Button(self.frame, text="Generar Excel", command=self.save_excel_dialog)
         self.excel_button.grid(row=4, column=0, padx=10, pady=10)
 
+        # Tabla con el detalle de cada espacio (estado, llegada, tiempo y confianza)
+        columns = ("espacio", "estado", "llegada", "tiempo", "confianza")
+        self.spaces_table = ttk.Treeview(self.frame, columns=columns, show="headings", height=8)
+        for column, title, width in zip(columns, ("Nro.", "Estado", "Llegada", "Tiempo", "Confianza"),
+                                        (50, 80, 90, 90, 80)):
+            self.spaces_table.heading(column, text=title)
+            self.spaces_table.column(column, width=width, anchor=tk.CENTER)
+        self.spaces_table.grid(row=5, column=0, padx=10, pady=10)
+        self.arrivals = {}  # Índice del espacio -> hora de llegada de los espacios ocupados
+
         # Iniciar el chequeo del estado de los espacios
         self.check_spaces_status()
     
@@ -77,30 +89,79 @@ class ParkingInterface:
     def save_excel_dialog(self):
         # Abre un diálogo para que el usuario elija dónde guardar el archivo
         file_path = filedialog.asksaveasfilename(defaultextension=".xlsx",
-                                                 filetypes=[("Excel files", "*.xlsx")],
+                                                 filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv")],
                                                  title="Guardar archivo Excel")
         if file_path:
-            # Llamar a la función que genera el Excel y pasarle la ruta
-            threading.Thread(target=self.generate_excel_file, args=(file_path,)).start()
+            # Deshabilitar el botón mientras dura la exportación, para no lanzar dos a la vez
+            self.excel_button.state(['disabled'])
+            thread = threading.Thread(target=self.generate_excel_file, args=(file_path,))
+            thread.start()
+            self.wait_for_export(thread)
 
     def generate_excel_file(self, file_path):
-        # Llama a la función que genera el archivo Excel
-        generate_excel(file_path)
+        # Exporta solo los registros nuevos y guarda el archivo (Excel con el registro y los agregados, o CSV)
+        export_report(file_path)
+
+    def wait_for_export(self, thread):
+        # Volver a habilitar el botón (desde el hilo de Tk) cuando termine la exportación
+        if thread.is_alive():
+            self.root.after(200, self.wait_for_export, thread)
+        else:
+            self.excel_button.state(['!disabled'])
 
     def check_spaces_status(self):
-        # Actualiza el estado de los espacios leyendo el archivo spaces_status.pkl
+        # Actualiza el estado de los espacios leyendo el canal compartido que escribe main5.py.
+        # Solo llegan los espacios que cambiaron desde la última lectura.
         try:
-            with open(self.spaces_status_path, 'rb') as f:
-                free_spaces, occupied_spaces = pickle.load(f)
-                self.free_label.config(text=f"Espacios Libres: {free_spaces}")
-                self.occupied_label.config(text=f"Espacios Ocupados: {occupied_spaces}")
-        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
-            # Archivo no encontrado, vacío o corrupto
+            if self.status_reader is None:
+                self.status_reader = StatusReader(self.spaces_status_path)
+            status = self.status_reader.poll_delta()  # None si no hubo cambios
+            if status is not None:
+                self.free_label.config(text=f"Espacios Libres: {status['free']}")
+                self.occupied_label.config(text=f"Espacios Ocupados: {status['occupied']}")
+                self.update_spaces_table(status)
+        except (FileNotFoundError, ValueError):
+            # El detector todavía no creó el canal
             pass
 
+        # Los tiempos de ocupación avanzan sin volver a leer el estado
+        self.update_occupied_times()
+
         # Verifica el estado cada 1 segundo
         self.root.after(1000, self.check_spaces_status)
 
+    def update_spaces_table(self, status):
+        if status['full']:
+            # Primera lectura o posiciones nuevas: reconstruir la tabla
+            self.spaces_table.delete(*self.spaces_table.get_children())
+            self.arrivals.clear()
+
+        for i, occupied, start, confidence in zip(status['indices'], status['occupancy'],
+                                                  status['start_times'], status['confidence']):
+            i = int(i)
+            if occupied:
+                self.arrivals[i] = start
+                values = (i + 1, "Ocupado", time.strftime('%H:%M:%S', time.localtime(start)),
+                          self.format_elapsed(time.time() - start), f"{confidence:.0%}")
+            else:
+                self.arrivals.pop(i, None)
+                values = (i + 1, "Libre", "", "", "")
+            if self.spaces_table.exists(str(i)):
+                self.spaces_table.item(str(i), values=values)
+            else:
+                self.spaces_table.insert("", tk.END, iid=str(i), values=values)
+
+    def update_occupied_times(self):
+        now = time.time()
+        for i, start in self.arrivals.items():
+            self.spaces_table.set(str(i), "tiempo", self.format_elapsed(now - start))
+
+    @staticmethod
+    def format_elapsed(seconds):
+        hours, rem = divmod(max(seconds, 0), 3600)
+        minutes, seconds = divmod(rem, 60)
+        return f'{int(hours):02}:{int(minutes):02}:{int(seconds):02}'
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = ParkingInterface(root)
@@ -0,0 +1,300 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Escritor de parking_log en segundo plano: las salidas se acumulan en memoria y se
+# insertan con executemany en una sola transacción cuando se junta un lote o pasa un
+# intervalo. Si la base de datos no responde, las filas se guardan en un diario local
+# (JSON por línea) y se reenvían cuando la conexión vuelve. Así un servidor MySQL lento
+# o caído nunca detiene el procesamiento de fotogramas. Si la base de datos rechaza una
+# fila en particular (y no la conexión), las demás se escriben igual; la rechazada vuelve
+# al diario y, después de max_attempts rechazos, pasa a un archivo de descartes
+# (<diario>.dead, mismo formato) para revisarla a mano.
+#
+# Cada salida puede llevar una ficha (token) que el escritor devuelve en take_durable() recién
+# cuando la fila quedó confirmada en la base de datos o escrita en el diario: así quien la
+# registró sabe cuándo puede olvidar la sesión abierta sin perder la fila si el proceso cae.
+
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS parking_log (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        space_number INT NOT NULL,
+                        llegada DATETIME NOT NULL,
+                        salida DATETIME,
+                        fecha DATE NOT NULL,
+                        total DECIMAL(10, 2)
+                        )'''
+
+# Misma tabla para el sustituto local en SQLite (pruebas sin servidor MySQL)
+SQLITE_CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS parking_log (
+                               id INTEGER PRIMARY KEY AUTOINCREMENT,
+                               space_number INT NOT NULL,
+                               llegada DATETIME NOT NULL,
+                               salida DATETIME,
+                               fecha DATE NOT NULL,
+                               total DECIMAL(10, 2)
+                               )'''
+
+INSERT_SQL = '''INSERT INTO parking_log (space_number, llegada, salida, fecha, total)
+                VALUES ({p}, {p}, {p}, {p}, {p})'''
+
+
+# Fila de parking_log para una estadía: 0.20 centavos por minuto
+def parking_row(space_number, start_time, end_time):
+    total_minutes = (end_time - start_time).total_seconds() / 60
+    total_cost = round(total_minutes * 0.20, 2)
+    return (space_number, start_time, end_time, start_time.date(), total_cost)
+
+
+class ParkingLogWriter:
+    # connect: función sin argumentos que devuelve una conexión DB-API (MySQL, SQLite, ...)
+    # placeholder: '%s' para mysql.connector, '?' para sqlite3
+    def __init__(self, connect, journal_filename, batch_size=50, flush_interval=5.0,
+                 retry_interval=10.0, placeholder='%s', setup_sql=CREATE_TABLE_SQL, max_attempts=3):
+        self.connect = connect
+        self.journal_filename = journal_filename
+        self.dead_filename = journal_filename + '.dead'
+        self.max_attempts = max_attempts  # Rechazos de una fila antes de descartarla
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.insert_sql = INSERT_SQL.format(p=placeholder)
+        self.setup_sql = setup_sql
+
+        self.written = 0      # Filas confirmadas en la base de datos
+        self.journaled = 0    # Filas enviadas al diario local
+        self.rejected = 0     # Rechazos de filas individuales por la base de datos
+        self.dead = 0         # Filas descartadas al archivo de descartes
+        self._queue = queue.Queue()
+        self._durable = deque()  # Fichas de las filas ya escritas en la base de datos o el diario
+        self._conn = None
+        self._last_attempt = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Cantidad de salidas esperando a ser escritas
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    # Registrar una salida; no bloquea
+    def log(self, space_number, start_time, end_time, token=None):
+        self._queue.put((parking_row(space_number, start_time, end_time), token))
+
+    # Fichas de las salidas que ya están a salvo desde la última llamada
+    def take_durable(self):
+        tokens = []
+        while self._durable:
+            tokens.append(self._durable.popleft())
+        return tokens
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='parking-log', daemon=True)
+        self._thread.start()
+        return self
+
+    # Detener el hilo escribiendo todo lo pendiente (o enviándolo al diario)
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._flush_items(self._drain())
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _drain(self):
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                return rows
+
+    def _run(self):
+        items = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            try:
+                items.append(self._queue.get(timeout=max(0.0, min(0.5, deadline - time.monotonic()))))
+            except queue.Empty:
+                pass
+            if len(items) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush_items(items)
+                items = []
+                deadline = time.monotonic() + self.flush_interval
+        # Devolver a la cola lo que quedó sin escribir para que stop() lo procese
+        for item in items:
+            self._queue.put(item)
+
+    # Elementos (fila, ficha) de la cola
+    def _flush_items(self, items):
+        self.flush([row for row, _ in items], [token for _, token in items])
+
+    # Conectarse (o reconectarse) sin reintentar más seguido que retry_interval
+    def _ensure_connection(self):
+        if self._conn is not None:
+            return True
+        now = time.monotonic()
+        if self._last_attempt is not None and now - self._last_attempt < self.retry_interval and not self._stop.is_set():
+            return False
+        self._last_attempt = now
+        try:
+            conn = self.connect()
+            if self.setup_sql:
+                cursor = conn.cursor()
+                cursor.execute(self.setup_sql)
+                conn.commit()
+                cursor.close()
+        except Exception as e:
+            logger.warning("No se pudo conectar a la base de datos: %s", e)
+            return False
+        self._conn = conn
+        return True
+
+    def _insert(self, rows):
+        cursor = self._conn.cursor()
+        try:
+            cursor.executemany(self.insert_sql, rows)
+            self._conn.commit()
+        finally:
+            cursor.close()
+
+    def _disconnect(self):
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    # Deshacer la transacción fallida; devuelve False si la conexión ya no responde
+    def _recover(self):
+        try:
+            self._conn.rollback()
+            cursor = self._conn.cursor()
+            try:
+                cursor.execute('SELECT 1')
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            self._disconnect()
+            return False
+
+    # Escribir las entradas (fila, rechazos) en una transacción; si falla con la conexión
+    # viva, se escriben de a una para aislar las que la base de datos rechaza. Devuelve las
+    # entradas sin escribir, con el rechazo contado solo si la culpa fue de la fila.
+    def _write(self, entries):
+        if not entries:
+            return []
+        try:
+            self._insert([row for row, _ in entries])
+            self.written += len(entries)
+            return []
+        except Exception as e:
+            logger.warning("Error al escribir en la base de datos: %s", e)
+            if not self._recover():
+                return entries
+
+        failed = []
+        for k, (row, attempts) in enumerate(entries):
+            try:
+                self._insert([row])
+                self.written += 1
+            except Exception as e:
+                if not self._recover():
+                    return failed + entries[k:]
+                logger.warning("La base de datos rechazó la fila %s: %s", row, e)
+                self.rejected += 1
+                failed.append((row, attempts + 1))
+        return failed
+
+    # Escribir las filas nuevas junto con las del diario pendiente; lo que no se pudo
+    # escribir queda en el diario y lo rechazado demasiadas veces pasa a descartes. Al
+    # terminar, las fichas de las filas nuevas pasan a take_durable().
+    def flush(self, rows, tokens=()):
+        if not rows and not os.path.exists(self.journal_filename):
+            return
+        entries = [(row, 0) for row in rows]
+        if not self._ensure_connection():
+            self._append(self.journal_filename, entries)
+            self.journaled += len(entries)
+            self._durable.extend(token for token in tokens if token is not None)
+            return
+
+        journal = self._read_journal(self.journal_filename)
+        failed_journal = self._write(journal)
+        if len(failed_journal) < len(journal):
+            logger.info("Se reenviaron %d registros del diario local.", len(journal) - len(failed_journal))
+        failed_new = self._write(entries) if self._conn is not None else entries
+        self.journaled += len(failed_new)
+
+        failed = failed_journal + failed_new
+        dead = [entry for entry in failed if entry[1] >= self.max_attempts]
+        if dead:
+            logger.error("%d registros rechazados %d veces pasan a %s", len(dead), self.max_attempts,
+                         self.dead_filename)
+            self._append(self.dead_filename, dead)
+            self.dead += len(dead)
+        if failed or os.path.exists(self.journal_filename):
+            self._replace_journal([entry for entry in failed if entry[1] < self.max_attempts])
+        self._durable.extend(token for token in tokens if token is not None)
+
+    @staticmethod
+    def _encode(row, attempts):
+        space_number, start_time, end_time, fecha, total = row
+        return json.dumps([space_number, start_time.isoformat(), end_time.isoformat(),
+                           fecha.isoformat(), total, attempts]) + '\n'
+
+    def _append(self, filename, entries):
+        if not entries:
+            return
+        with open(filename, 'a') as f:
+            for row, attempts in entries:
+                f.write(self._encode(row, attempts))
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Reescribir el diario con las entradas pendientes (archivo temporal + rename, así un
+    # corte a mitad de camino deja el diario anterior entero)
+    def _replace_journal(self, entries):
+        if not entries:
+            if os.path.exists(self.journal_filename):
+                os.remove(self.journal_filename)
+            return
+        temp = self.journal_filename + '.tmp'
+        with open(temp, 'w') as f:
+            for row, attempts in entries:
+                f.write(self._encode(row, attempts))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.journal_filename)
+
+    # Entradas (fila, rechazos) de un diario; las líneas sin contador de rechazos son de
+    # versiones anteriores
+    def _read_journal(self, filename):
+        if not os.path.exists(filename):
+            return []
+        entries = []
+        with open(filename) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    fields = json.loads(line)
+                    space_number, llegada, salida, fecha, total = fields[:5]
+                except ValueError:
+                    continue  # Línea incompleta por un corte durante la escritura
+                attempts = fields[5] if len(fields) > 5 else 0
+                entries.append(((space_number, datetime.fromisoformat(llegada), datetime.fromisoformat(salida),
+                                 datetime.fromisoformat(fecha).date(), total), attempts))
+        return entries
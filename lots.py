@@ -0,0 +1,105 @@
+import time
+import numpy as np
+from occupancy import SpaceLayout
+from smoothing import OccupancyFilter
+from sessions import space_key
+
+# Estado de ocupación de un estacionamiento, guardado en arreglos por espacio en lugar
+# de diccionarios con claves de tupla. Lo comparten el servidor multi-cámara y el
+# análisis por lotes. Con `smoothing` (parámetros de OccupancyFilter) la ocupación
+# observada pasa por el filtro de histéresis antes de abrir o cerrar sesiones, y con
+# `sessions` (SessionStore) las sesiones abiertas sobreviven a un reinicio.
+
+
+class ParkingLot:
+    def __init__(self, name, positions_filename, smoothing=None, sessions=None):
+        self.name = name
+        self.layout = SpaceLayout(positions_filename)
+        n_spaces = len(self.layout.pos_list)
+        self.occupied = np.zeros(n_spaces, bool)
+        self.start_times = np.full(n_spaces, np.nan)  # Hora de llegada (timestamp) o NaN si está libre
+        self.filter = None if smoothing is None else OccupancyFilter(n_spaces, **smoothing)
+        self.removed_departures = []  # Salidas de espacios borrados ocupados, para el próximo update()
+
+        # Registro de sesiones abiertas (SessionStore): se recuperan al iniciar
+        self.sessions = sessions
+        if sessions is not None:
+            restored = sessions.restore(self.layout.pos_list)
+            indices = np.fromiter(restored.keys(), np.int64, len(restored))
+            self.occupied[indices] = True
+            self.start_times[indices] = np.fromiter(restored.values(), np.float64, len(restored))
+            if self.filter is not None:
+                self.filter.set_occupied(indices)
+
+    @property
+    def n_spaces(self):
+        return len(self.occupied)
+
+    @property
+    def free_spaces(self):
+        return int(self.n_spaces - self.occupied.sum())
+
+    @property
+    def occupied_spaces(self):
+        return int(self.occupied.sum())
+
+    # Recargar las posiciones si 2.py las cambió; los espacios que siguen existiendo conservan su
+    # estado y los que se borraron estando ocupados se cierran como una salida
+    def refresh(self, now=None):
+        old_pos_list = self.layout.pos_list
+        old_keys = [tuple(map(tuple, pos)) for pos in old_pos_list]
+        if not self.layout.refresh():
+            return False
+        now = time.time() if now is None else now
+        old_index = {key: i for i, key in enumerate(old_keys)}
+        n_spaces = len(self.layout.pos_list)
+        occupied = np.zeros(n_spaces, bool)
+        start_times = np.full(n_spaces, np.nan)
+        new_index = np.full(n_spaces, -1)
+        for i, pos in enumerate(self.layout.pos_list):
+            j = old_index.get(tuple(map(tuple, pos)))
+            if j is not None:
+                occupied[i] = self.occupied[j]
+                start_times[i] = self.start_times[j]
+                new_index[i] = j
+        # Salidas de los espacios ocupados que se borraron, con su número anterior; se
+        # entregan junto con las del próximo update() para que lleguen a parking_log
+        removed = np.setdiff1d(np.arange(len(old_keys)), new_index)
+        self.removed_departures.extend((int(j) + 1, float(self.start_times[j]), now, space_key(old_pos_list[j]))
+                                       for j in removed if self.occupied[j])
+        self.occupied = occupied
+        self.start_times = start_times
+        if self.filter is not None:
+            self.filter.reindex(new_index)
+        return True
+
+    # Ocupación a partir de la confianza observada en cada espacio: filtrada si el
+    # estacionamiento tiene filtro, si no cualquier confianza positiva cuenta como ocupado
+    def observe(self, confidence):
+        if self.filter is None:
+            return np.asarray(confidence) > 0
+        return self.filter.update(confidence)
+
+    # Aplicar un nuevo vector de ocupación; devuelve las salidas como (número de espacio,
+    # llegada, salida, clave del espacio) con tiempos en timestamp, incluidas las de los
+    # espacios ocupados que borró el último refresh(). Las sesiones de las salidas siguen
+    # guardadas hasta que quien las registra llama a sessions.settle() con (clave, llegada).
+    def update(self, occupied, now=None):
+        now = time.time() if now is None else now
+        occupied = np.asarray(occupied, bool)
+
+        arrivals = occupied & ~self.occupied
+        departures = ~occupied & self.occupied
+        self.start_times[arrivals] = now
+
+        leaving = np.flatnonzero(departures)
+        pos_list = self.layout.pos_list
+        events = self.removed_departures + [(int(i) + 1, float(self.start_times[i]), now, space_key(pos_list[i]))
+                                            for i in leaving]
+        self.removed_departures = []
+        self.start_times[departures] = np.nan
+        self.occupied = occupied.copy()
+
+        if self.sessions is not None:
+            self.sessions.record({space_key(pos_list[i]): now for i in np.flatnonzero(arrivals)})
+        return events
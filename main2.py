@@ -5,6 +5,7 @@ import numpy as np
 import time
 import os
 from ultralytics import YOLO
+from occupancy import build_polygons, boxes_from_results, box_centers, check_occupancy
 
 # Cargar el modelo YOLOv8 preentrenado
 model = YOLO('yolov8m.pt') # Puedes cambiar a yolov8m.pt o yolov8l.pt para modelos más grandes
@@ -26,6 +27,9 @@ except FileNotFoundError:
     exit()
 print(posList)
 
+# Polígonos de todos los espacios en un solo arreglo, calculados una sola vez
+polygons = build_polygons(posList)
+
 
 # Crear un diccionario para almacenar el tiempo de ocupación de cada espacio
 occupied_times = {tuple(map(tuple, pos)): 0 for pos in posList}
@@ -38,31 +42,19 @@ def checkSpaces(img):
     results = model(img, conf=0.25)  # Ajusta el umbral de confianza
          # Usar YOLOv8 para la detección de autos en la imagen
 
-    for pos in posList:
+    # Centros de todos los autos detectados en un solo arreglo
+    centers = box_centers(boxes_from_results(results, classes=(2,)))
+
+    # Ocupación de todos los espacios en una sola pasada vectorizada
+    occupied = check_occupancy(centers, polygons)
+
+    for i, pos in enumerate(posList):
         # Convertir la posición actual en numpy array para formar un polígono
         polygon = np.array(pos, np.int32)
         polygon = polygon.reshape((-1, 1, 2))
 
-        # Crear una máscara negra del tamaño de la imagen
-        mask = np.zeros(img.shape[:2], np.uint8)
-
-        # Dibujar el polígono en la máscara
-        cv2.fillPoly(mask, [polygon], 255)
-
-        # Detectar si algún auto está dentro del espacio usando las detecciones de YOLO
-        detected_car = False
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                cls = int(box.cls[0])  # Clase detectada
-                if cls == 2:  # Clase 'cars' en COCO
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])  # Coordenadas del auto
-                    center_x = (x1 + x2) // 2
-                    center_y = (y1 + y2) // 2
-
-                    # Verificar si el auto está dentro del espacio de estacionamiento
-                    if cv2.pointPolygonTest(polygon, (center_x, center_y), False) >= 0:
-                        detected_car = True
+        # Ocupación calculada previamente para todos los espacios
+        detected_car = occupied[i]
 
         # Convertir la posición actual a tupla para usarla como clave
         pos_tuple = tuple(map(tuple, pos))
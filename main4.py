@@ -5,10 +5,12 @@ import numpy as np
 import time
 import os
 import mysql.connector
-from ultralytics import YOLO
+from detector import load_detector
+from occupancy import SpaceLayout, box_centers
 
 # Cargar el modelo YOLOv8 preentrenado
-model = YOLO('yolov8m.pt')  # Puedes cambiar a yolov8m.pt o yolov8l.pt para modelos más grandes
+DETECTOR_BACKEND = 'torch'  # 'onnx' u 'openvino' para exportar el modelo y acelerar la CPU
+detector = load_detector('yolov8m.pt', DETECTOR_BACKEND)  # Puedes cambiar a yolov8m.pt o yolov8l.pt para modelos más grandes
 
 # Obtener el directorio del script actual
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -38,17 +40,27 @@ conn.commit()
 
 # Cargar la lista de posiciones de los espacios de estacionamiento desde el archivo 'CarParkPos'
 try:
-    with open(car_park_pos_filename, 'rb') as f:
-        posList = pickle.load(f)  # Cargar las posiciones seleccionadas en SpacePicker
+    layout = SpaceLayout(car_park_pos_filename)  # Posiciones seleccionadas en SpacePicker
 except FileNotFoundError:
     print(f"Error: No se encontró el archivo '{car_park_pos_filename}'. Asegúrate de que el archivo exista en el directorio actual.")
     exit()
+posList = layout.pos_list
 print(posList)
 
 # Crear un diccionario para almacenar el tiempo de ocupación de cada espacio
 occupied_times = {tuple(map(tuple, pos)): 0 for pos in posList}
 start_times = {tuple(map(tuple, pos)): None for pos in posList}
 
+# Recargar las posiciones si 2.py guardó nuevos espacios; el mapa de etiquetas solo se reconstruye entonces
+def refresh_positions():
+    global posList
+    if layout.refresh():
+        posList = layout.pos_list
+        for pos in posList:
+            key = tuple(map(tuple, pos))
+            start_times.setdefault(key, None)
+            occupied_times.setdefault(key, 0)
+
 # Función para registrar en la base de datos MySQL
 def log_parking_time(space_number, occupied_time):
     if occupied_time > 10:  # Solo registrar si el tiempo es mayor a 10 segundos
@@ -60,33 +72,21 @@ def log_parking_time(space_number, occupied_time):
 # Función para verificar los espacios y detectar autos usando YOLO
 def checkSpaces(img):
     spaces = 0
-    results = model(img, conf=0.25)  # Ajusta el umbral de confianza
+    detections = detector.detect(img, classes=(2,), conf=0.25)[0]  # Ajusta el umbral de confianza
+
+    # Centros de todos los autos detectados en un solo arreglo
+    centers = box_centers(detections[:, :4])
+
+    # Ocupación de todos los espacios: cada centro se resuelve con un acceso al mapa de etiquetas
+    occupied = layout.occupancy(centers, img.shape)
 
     for i, pos in enumerate(posList):
         # Convertir la posición actual en numpy array para formar un polígono
         polygon = np.array(pos, np.int32)
         polygon = polygon.reshape((-1, 1, 2))
 
-        # Crear una máscara negra del tamaño de la imagen
-        mask = np.zeros(img.shape[:2], np.uint8)
-
-        # Dibujar el polígono en la máscara
-        cv2.fillPoly(mask, [polygon], 255)
-
-        # Detectar si algún auto está dentro del espacio usando las detecciones de YOLO
-        detected_car = False
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                cls = int(box.cls[0])  # Clase detectada
-                if cls == 2:  # Clase 'cars' en COCO
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])  # Coordenadas del auto
-                    center_x = (x1 + x2) // 2
-                    center_y = (y1 + y2) // 2
-
-                    # Verificar si el auto está dentro del espacio de estacionamiento
-                    if cv2.pointPolygonTest(polygon, (center_x, center_y), False) >= 0:
-                        detected_car = True
+        # Ocupación calculada previamente para todos los espacios
+        detected_car = occupied[i]
 
         # Convertir la posición actual a tupla para usarla como clave
         pos_tuple = tuple(map(tuple, pos))
@@ -147,6 +147,9 @@ def process_frame():
             print("Error al capturar el fotograma.")
             break
 
+        # Recargar las posiciones solo si cambiaron en disco
+        refresh_positions()
+
         # Revisar los espacios de estacionamiento y calcular los tiempos de ocupación
         free_spaces, occupied_spaces = checkSpaces(img)
 
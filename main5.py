@@ -1,22 +1,114 @@
 import cv2
-import pickle
 import cvzone
 import numpy as np
 import time
 import os
+import argparse
+import signal
+import threading
 import mysql.connector
 from datetime import datetime
-from ultralytics import YOLO
+from detector import load_detector, vehicle_classes
+from occupancy import SpaceLayout, box_centers
+from scheduler import MotionGate
+from pipeline import Pipeline
+from roi import detect_in_regions
+from log_writer import ParkingLogWriter
+from status_channel import StatusWriter
+from smoothing import OccupancyFilter
+from sessions import SessionStore, space_key
+from tracker import IoUTracker
+from profiling import Profiler
+from metrics import MetricsRegistry, MetricsServer, profiler_collector, rate_of
+from render import SpaceRenderer
+from snapshot import FrameSnapshot
+from patches import PatchClassifier
 
-# Cargar el modelo YOLOv8 preentrenado
-model = YOLO('yolov8m.pt')
+# Modo de detección: 'yolo' (YOLOv8 sobre el fotograma) o 'patches' (cada espacio se lleva
+# a un parche normalizado y se puntúa por densidad de bordes; para cámaras fijas, mucho más
+# barato en CPU). Con 'patches' no hay cajas, así que no se usan el seguidor ni OCCUPANCY_MODE;
+# PATCH_LOW y PATCH_HIGH son las densidades de bordes de un espacio vacío y uno ocupado.
+DETECTION_MODE = 'yolo'
+PATCH_LOW = 0.02
+PATCH_HIGH = 0.08
+
+# Cargar el modelo YOLOv8 preentrenado: 'torch' usa los pesos directamente; 'onnx' u
+# 'openvino' los exportan una vez (en caché) para ejecutarlos más rápido en CPU
+DETECTOR_BACKEND = 'torch'
+
+# Clases de vehículos a detectar, tamaño de entrada y máximo de detecciones por imagen.
+# Se aplican dentro de la llamada al modelo, no en Python.
+VEHICLE_CLASSES = vehicle_classes(['car', 'truck', 'bus', 'motorcycle'])
+IMAGE_SIZE = 640
+MAX_DETECTIONS = 300
+
+# Confianza mínima de una detección de YOLO
+DETECTION_CONF = 0.25
+
+detector = None
+if DETECTION_MODE == 'yolo':
+    detector = load_detector('yolov8m.pt', DETECTOR_BACKEND, imgsz=IMAGE_SIZE, max_det=MAX_DETECTIONS)
 
 # Obtener el directorio del script actual
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
+# Modo de ocupación: 'center' (centro del auto dentro del polígono), 'overlap' (fracción
+# del espacio cubierta por la caja del auto, útil con cámaras inclinadas) o 'indexed'
+# (como 'center' pero con la grilla de spatial_index.py en lugar del mapa de etiquetas,
+# para panorámicas de miles de espacios donde un mapa del tamaño de la imagen pesa demasiado)
+OCCUPANCY_MODE = 'center'
+OVERLAP_THRESHOLD = 0.4
+
+# Inferencia por movimiento: YOLO solo corre si algún espacio cambió más de MOTION_THRESHOLD
+# niveles de gris en promedio, o si pasaron MAX_INFERENCE_INTERVAL segundos sin correr
+MOTION_THRESHOLD = 12.0
+MAX_INFERENCE_INTERVAL = 5.0
+
+# Inferencia recortada: YOLO solo procesa las regiones que cubren los espacios (con un margen
+# en píxeles para la parte del auto que sobresale del polígono). Desactivada por defecto: un
+# auto que asoma desde fuera de las regiones se detecta peor en el recorte
+USE_ROI_CROP = False
+ROI_MARGIN = 40
+
+# Filtro temporal con histéresis: un espacio se ocupa cuando el promedio móvil de la confianza
+# supera SMOOTHING['enter_threshold'] en enter_frames inferencias seguidas, y se libera cuando
+# baja de exit_threshold en exit_frames inferencias seguidas. Evita cerrar y abrir sesiones
+# por una sola detección perdida. La confianza de un espacio es la de su auto, que ya pasó
+# DETECTION_CONF, así que el umbral de entrada no puede ser mayor.
+SMOOTHING = {'alpha': 0.5, 'enter_threshold': DETECTION_CONF, 'exit_threshold': 0.1, 'enter_frames': 2,
+             'exit_frames': 4}
+
+# Seguimiento de vehículos: con USE_TRACKER un espacio solo cuenta un auto cuya pista lleva
+# al menos MIN_DWELL segundos en él, así los autos que circulan no abren sesiones
+USE_TRACKER = False
+MIN_DWELL = 10.0
+tracker = IoUTracker()
+
+# Tiempos por etapa (p50/p95/p99) con reporte cada PROFILE_REPORT_EVERY segundos; en Linux
+# `kill -USR1` imprime el reporte y `kill -USR2` perfila los próximos fotogramas con cProfile
+PROFILE_REPORT_EVERY = 60.0
+profiler = Profiler(report_every=PROFILE_REPORT_EVERY)
+
+# Puerto del endpoint de métricas de Prometheus (GET /metrics); 0 lo desactiva. Solo escucha
+# en METRICS_HOST (la propia máquina) salvo que se indique otra dirección con --metrics-host
+METRICS_PORT = 9108
+METRICS_HOST = '127.0.0.1'
+
+# Vista por HTTP en el mismo puerto (GET /snapshot.jpg o /stream.mjpg) para revisar la cámara
+# sin ventana, solo con --snapshot (muestra la imagen de la cámara a quien llegue al puerto);
+# solo se dibuja y codifica mientras alguien la mira, a lo sumo cada SNAPSHOT_INTERVAL segundos
+SNAPSHOT_INTERVAL = 1.0
+snapshot = FrameSnapshot(SNAPSHOT_INTERVAL)
+
+# Se activa con SIGTERM o SIGINT (Ctrl+C) para terminar el ciclo de fotogramas ordenadamente
+stop_event = threading.Event()
+
+# Con --pipeline, la inferencia lee las posiciones mientras el hilo principal puede recargarlas
+layout_lock = threading.Lock()
+
 # Rutas para los archivos de posiciones y estado de espacios
 car_park_pos_filename = os.path.join(script_dir, 'CarParkPos.pkl')
-spaces_status_filename = os.path.join(script_dir, 'spaces_status.pkl')
+spaces_status_filename = os.path.join(script_dir, 'spaces_status.bin')
 
 # Conexión a la base de datos MySQL
 db_config = {
@@ -25,143 +117,429 @@ db_config = {
     'host': 'localhost',
     'database': 'parking_system'
 }
-conn = mysql.connector.connect(**db_config)
-cursor = conn.cursor()
-
-# Crear tabla si no existe
-cursor.execute('''CREATE TABLE IF NOT EXISTS parking_log (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    space_number INT NOT NULL,
-                    llegada DATETIME NOT NULL,
-                    salida DATETIME,
-                    fecha DATE NOT NULL,
-                    total DECIMAL(10, 2)
-                    )''')
-conn.commit()
+
+# Escritor de parking_log en segundo plano: crea la tabla al conectarse, inserta por lotes
+# y guarda en un diario local lo que no se pudo escribir mientras MySQL no responde
+parking_log_journal_filename = os.path.join(script_dir, 'parking_log_journal.jsonl')
+log_writer = ParkingLogWriter(lambda: mysql.connector.connect(**db_config), parking_log_journal_filename).start()
+
+# Sesiones abiertas guardadas en disco (SQLite en modo WAL) para no perder las horas de
+# llegada si el detector se reinicia
+sessions_filename = os.path.join(script_dir, 'parking_sessions.db')
+session_store = SessionStore(sessions_filename)
+
+# Canal de estado en memoria compartida que lee interfaz2.py
+status_writer = StatusWriter(spaces_status_filename)
 
 # Cargar la lista de posiciones de los espacios de estacionamiento
 try:
-    with open(car_park_pos_filename, 'rb') as f:
-        posList = pickle.load(f)
+    layout = SpaceLayout(car_park_pos_filename)
 except FileNotFoundError:
     print(f"Error: No se encontró el archivo '{car_park_pos_filename}'. Asegúrate de que el archivo exista.")
     exit()
+posList = layout.pos_list
 print(posList)
+# Claves de tupla de cada espacio, calculadas una vez por juego de posiciones
+posKeys = [tuple(map(tuple, pos)) for pos in posList]
 
 # Diccionario para almacenar el tiempo de ocupación de cada espacio
-start_times = {tuple(map(tuple, pos)): None for pos in posList}
-
-# Función para registrar en la base de datos MySQL
-def log_parking_time(space_number, start_time, end_time):
-    total_minutes = (end_time - start_time).total_seconds() / 60
-    total_cost = round(total_minutes * 0.20, 2)  # 0.20 centavos por minuto
-
-    # Registrar en la base de datos
-    fecha = start_time.date()
-    cursor.execute('''INSERT INTO parking_log (space_number, llegada, salida, fecha, total)
-                      VALUES (%s, %s, %s, %s, %s)''',
-                   (space_number, start_time, end_time, fecha, total_cost))
-    conn.commit()
-
-# Función para verificar los espacios y detectar autos usando YOLO
-def checkSpaces(img):
-    spaces = 0
-    results = model(img, conf=0.25)
+start_times = {key: None for key in posKeys}
 
-    for i, pos in enumerate(posList):
-        polygon = np.array(pos, np.int32).reshape((-1, 1, 2))
+# Capa con los dibujos de los espacios (se crea con el primer fotograma)
+renderer = None
+
+# Clasificador por parches (modo 'patches'; se crea con las posiciones actuales)
+patch_classifier = None
+
+# Estado filtrado de ocupación de cada espacio
+space_filter = OccupancyFilter(len(posList), **SMOOTHING)
+
+# Métricas: el ciclo solo incrementa contadores; lo demás se lee al momento de la consulta
+metrics = MetricsRegistry()
+frames_counter = metrics.counter('frames_total', "Fotogramas procesados")
+inferences_counter = metrics.counter('inferences_total', "Inferencias ejecutadas (YOLO o parches)")
+inference_latency = metrics.histogram('inference_seconds', "Latencia de detección y ocupación por inferencia")
+metrics.gauge('fps', "Fotogramas por segundo desde la consulta anterior", fn=rate_of(frames_counter))
+metrics.gauge('spaces_total', "Espacios configurados", fn=lambda: len(posList))
+metrics.gauge('spaces_occupied', "Espacios ocupados",
+              fn=lambda: sum(start_times.get(key) is not None for key in posKeys))
+metrics.gauge('log_queue_depth', "Salidas esperando a escribirse en parking_log", fn=lambda: log_writer.pending)
+metrics.counter('log_rows_written_total', "Filas escritas en parking_log", fn=lambda: log_writer.written)
+metrics.counter('log_rows_journaled_total', "Filas enviadas al diario local", fn=lambda: log_writer.journaled)
+metrics.counter('log_rows_dead_total', "Filas rechazadas por la base de datos y descartadas", fn=lambda: log_writer.dead)
+metrics.add_collector(profiler_collector(profiler))
+
+# Recuperar las sesiones que seguían abiertas cuando el detector se detuvo
+restored = session_store.restore(posList)
+for i, start in restored.items():
+    start_times[posKeys[i]] = start
+space_filter.set_occupied(list(restored))
+if restored:
+    print(f"Se recuperaron {len(restored)} sesiones abiertas.")
+
+# Recargar las posiciones si 2.py guardó nuevos espacios; el mapa de etiquetas solo se reconstruye entonces
+def refresh_positions():
+    global posList, posKeys, renderer, patch_classifier
+    old_pos_list, old_keys = posList, posKeys
+    old_index = {key: i for i, key in enumerate(posKeys)}
+    if not layout.refresh():
+        return False
+    posList = layout.pos_list
+    posKeys = [tuple(map(tuple, pos)) for pos in posList]
+    # Los espacios ocupados que se borraron registran su salida con el número anterior; su
+    # sesión se cierra como cualquier otra cuando la fila está a salvo (checkSpaces)
+    end_time = time.time()
+    kept = set(posKeys)
+    for j, key in enumerate(old_keys):
+        if key in kept:
+            continue
+        start = start_times.pop(key, None)
+        if start is not None:
+            log_parking_time(j + 1, datetime.fromtimestamp(start), datetime.fromtimestamp(end_time),
+                             token=(space_key(old_pos_list[j]), start))
+    # Los espacios que siguen existiendo conservan su estado filtrado
+    space_filter.reindex([old_index.get(key, -1) for key in posKeys])
+    renderer = None  # Los contornos cambiaron: rehacer la capa y los mapas de los parches
+    patch_classifier = None
+    for key in posKeys:
+        start_times.setdefault(key, None)
+    return True
+
+# Función para registrar en la base de datos MySQL (sin bloquear el procesamiento de fotogramas)
+def log_parking_time(space_number, start_time, end_time, token=None):
+    log_writer.log(space_number, start_time, end_time, token)
+
+# Confianza por parches: un remap para todos los espacios y un puntaje para el lote
+def patchConfidence(img):
+    global patch_classifier
+    if patch_classifier is None:
+        patch_classifier = PatchClassifier(posList, low=PATCH_LOW, high=PATCH_HIGH)
+    with profiler.stage('patches'):
+        return patch_classifier.confidence(img)
+
+# Función para detectar autos con YOLO y calcular la confianza de todos los espacios
+def yoloConfidence(img):
+    # Cajas de todos los autos detectados en un solo arreglo. Con el seguidor se piden también
+    # las detecciones de baja confianza: su segunda etapa las usa para continuar pistas y el
+    # umbral alto lo aplica el propio seguidor
+    conf = tracker.low_conf if USE_TRACKER else DETECTION_CONF
+    with profiler.stage('yolo'):
+        if USE_ROI_CROP:
+            regions = layout.crop_regions(img.shape, ROI_MARGIN)
+            detections = detect_in_regions(detector, img, regions, classes=VEHICLE_CLASSES, conf=conf)
+        else:
+            detections = detector.detect(img, classes=VEHICLE_CLASSES, conf=conf)[0]
+
+    # Solo cuentan los autos que se quedaron en un espacio (la pista reemplaza a la detección)
+    if USE_TRACKER:
+        with profiler.stage('tracker'):
+            now = time.time()
+            tracker.update(detections, now)
+            detections = tracker.dwelling(layout.label_map(img.shape), MIN_DWELL, now)
+    boxes, confidences = detections[:, :4], detections[:, 4]
+
+    with profiler.stage('occupancy'):
+        if OCCUPANCY_MODE == 'overlap':
+            # Ocupación por superposición caja/polígono, solo para los pares cercanos según la grilla
+            confidence = layout.overlap_confidence(boxes, confidences, OVERLAP_THRESHOLD)
+        elif OCCUPANCY_MODE == 'indexed':
+            # Cada centro se prueba solo contra los espacios de su celda de la grilla
+            confidence = layout.indexed_confidence(box_centers(boxes), confidences)
+        else:
+            # Ocupación de todos los espacios: cada centro se resuelve con un acceso al mapa de etiquetas
+            confidence = layout.occupancy_confidence(box_centers(boxes), confidences, img.shape)
+    return confidence
+
+# Confianza de ocupación de cada espacio en el fotograma (YOLO o parches), sin filtrar
+def detectConfidence(img):
+    start = time.perf_counter()
+    if DETECTION_MODE == 'patches':
+        confidence = patchConfidence(img)
+    else:
+        confidence = yoloConfidence(img)
+    inferences_counter.inc()
+    inference_latency.observe(time.perf_counter() - start)
+    return confidence
 
-        # Detectar si algún auto está dentro del espacio usando las detecciones de YOLO
-        detected_car = False
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                cls = int(box.cls[0])  # Clase detectada
-                if cls == 2:  # Clase 'cars' en COCO
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])  # Coordenadas del auto
-                    center_x = (x1 + x2) // 2
-                    center_y = (y1 + y2) // 2
+# Función para detectar autos y calcular la ocupación filtrada de todos los espacios
+def detectOccupancy(img):
+    confidence = detectConfidence(img)
+    # Ocupación filtrada en el tiempo a partir de la confianza de cada espacio
+    with profiler.stage('filter'):
+        occupied = space_filter.update(confidence)
+    return occupied, confidence
 
-                    # Verificar si el auto está dentro del espacio de estacionamiento
-                    if cv2.pointPolygonTest(polygon, (center_x, center_y), False) >= 0:
-                        detected_car = True
+# Función para verificar los espacios; si no se da la ocupación se detecta con YOLO
+def checkSpaces(img, occupied=None, draw=True):
+    spaces = 0
+    if occupied is None:
+        occupied, _ = detectOccupancy(img)
+
+    # Llegadas de este fotograma, guardadas juntas en el registro de sesiones
+    arrivals = {}
+
+    for i, pos in enumerate(posList):
+        # Ocupación calculada previamente para todos los espacios
+        detected_car = occupied[i]
 
-        pos_tuple = tuple(map(tuple, pos))
+        pos_tuple = posKeys[i]
 
         if detected_car:  # Si se detecta un auto
-            color = (0, 0, 200)  # Rojo
             if start_times[pos_tuple] is None:
                 # Registrar la hora de llegada
                 start_times[pos_tuple] = time.time()  # Guardar el tiempo como timestamp
+                arrivals[space_key(pos)] = start_times[pos_tuple]
         else:  # Si no hay auto detectado
-            color = (0, 200, 0)  # Verde
             spaces += 1
             if start_times[pos_tuple] is not None:
                 # Registrar la salida y el tiempo total en la base de datos
                 end_time = time.time()
-                log_parking_time(i + 1, datetime.fromtimestamp(start_times[pos_tuple]), datetime.fromtimestamp(end_time))
+                start = start_times[pos_tuple]
+                log_parking_time(i + 1, datetime.fromtimestamp(start), datetime.fromtimestamp(end_time),
+                                 token=(space_key(pos), start))
                 start_times[pos_tuple] = None  # Reiniciar el espacio
 
-        # Calcular y mostrar el tiempo de ocupación en horas, minutos y segundos si está ocupado
-        if start_times[pos_tuple] is not None:
-            occupied_time = time.time() - start_times[pos_tuple]
-            hours, rem = divmod(occupied_time, 3600)
-            minutes, seconds = divmod(rem, 60)
-            time_text = f'{int(hours):02}:{int(minutes):02}:{int(seconds):02}'
+    # Las sesiones de las salidas se borran recién cuando su fila está a salvo en parking_log
+    # (o en el diario local); si el proceso cae antes, la sesión se recupera al reiniciar
+    session_store.record(arrivals)
+    session_store.settle(log_writer.take_durable())
 
-            # Mostrar el tiempo de ocupación sobre el espacio en la imagen
-            cv2.putText(img, time_text, (polygon[0][0][0], polygon[0][0][1] - 10), 
-                        cv2.FONT_HERSHEY_PLAIN, 1, (255, 255, 255), 2)
+    # Dibujar los espacios (se omite sin ventana)
+    if draw:
+        drawSpaces(img, occupied, spaces)
 
-        # Dibujar el polígono del espacio
-        cv2.polylines(img, [polygon], isClosed=True, color=color, thickness=1)
+    return spaces, len(posList) - spaces
 
-        # Mostrar el número del espacio en la esquina inferior derecha del polígono
-        bottom_right_x = polygon[2][0][0]  
-        bottom_right_y = polygon[2][0][1]
-        cv2.putText(img, f'{i + 1}', (bottom_right_x - 40, bottom_right_y - 10), 
-                    cv2.FONT_HERSHEY_PLAIN, 2, (255, 255, 255), 2)
+# Dibujar los contornos, números y tiempos de ocupación desde la capa en caché; solo se
+# redibujan los espacios que cambiaron de estado o cuyo tiempo avanzó
+def drawSpaces(img, occupied, spaces):
+    global renderer
+    if renderer is None or renderer.shape != img.shape[:2] or len(renderer.polygons) != len(posList):
+        renderer = SpaceRenderer(posList, img.shape)
+    starts = [start_times[key] for key in posKeys]
+    starts = np.array([np.nan if t is None else t for t in starts], np.float64)
+    renderer.draw(img, occupied, starts, time.time())
 
     # Mostrar el estado de los espacios libres/ocupados
     cvzone.putTextRect(img, f'Free: {spaces}/{len(posList)}', (30, 40), thickness=3, offset=20, colorR=(0, 200, 0))
 
-    return spaces, len(posList) - spaces
+# Dibujar y mostrar el fotograma. Sin ventana (headless) no se usa HighGUI y solo se dibuja
+# si alguien pidió la vista por HTTP. Devuelve la tecla presionada (None sin ventana)
+def show_frame(img, occupied, free_spaces, headless):
+    wants_snapshot = snapshot.due()
+    if headless and not wants_snapshot:
+        return None
+    with profiler.stage('render'):
+        drawSpaces(img, occupied, free_spaces)
+    if wants_snapshot:
+        with profiler.stage('snapshot'):
+            snapshot.offer(img)
+    if headless:
+        return None
+    with profiler.stage('display'):
+        cv2.imshow("Image", img)
+        return cv2.waitKey(1) & 0xFF
+
+# SIGTERM (systemd, docker stop) y SIGINT terminan el ciclo en el próximo fotograma; un
+# segundo Ctrl+C sale sin esperar
+def install_shutdown_handlers():
+    def request_stop(signum, frame):
+        if stop_event.is_set():
+            raise KeyboardInterrupt
+        print(f"Señal {signal.Signals(signum).name} recibida, deteniendo el detector...")
+        stop_event.set()
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
 
-# Función para procesar los fotogramas de la cámara y mostrar los espacios ocupados/libres
-def process_frame():
+# Abrir la cámara con la resolución de trabajo
+def open_camera():
     cap = cv2.VideoCapture(1)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
 
     if not cap.isOpened():
         print("Error: No se pudo abrir la cámara.")
+        return None
+    return cap
+
+# Publicar el estado de cada espacio (ocupación, llegada y confianza) en el canal compartido;
+# solo se escribe si algo cambió
+def publish_status(confidence):
+    starts = [start_times[key] for key in posKeys]
+    starts = np.array([np.nan if t is None else t for t in starts], np.float64)
+    occupied = ~np.isnan(starts)
+    status_writer.publish(occupied, starts, np.where(occupied, confidence, 0.0))
+
+# Función para procesar los fotogramas de la cámara y mostrar los espacios ocupados/libres.
+# Termina con 'q' en la ventana o con SIGTERM/SIGINT
+def process_frame(headless=False):
+    cap = open_camera()
+    if cap is None:
         return
 
-    while True:
-        success, img = cap.read()
+    gate = MotionGate(MOTION_THRESHOLD, MAX_INFERENCE_INTERVAL)
+    occupied = confidence = None
+
+    while not stop_event.is_set():
+        with profiler.stage('capture'):
+            success, img = cap.read()
         if not success:
             print("Error al capturar el fotograma.")
             break
 
+        # Recargar las posiciones solo si cambiaron en disco
+        if refresh_positions():
+            gate.reset()
+
+        # Ejecutar YOLO solo si hubo movimiento en los espacios; si no, reutilizar la última ocupación
+        with profiler.stage('motion_gate'):
+            infer = gate.should_infer(img, layout.label_map(img.shape))
+        if infer:
+            occupied, confidence = detectOccupancy(img)
+            if gate.inferences % 50 == 0:
+                print(gate.report())
+
         # Revisar los espacios de estacionamiento y calcular los tiempos de ocupación
-        free_spaces, occupied_spaces = checkSpaces(img)
+        with profiler.stage('check_spaces'):
+            free_spaces, occupied_spaces = checkSpaces(img, occupied, draw=False)
 
-        # Guardar el estado de los espacios (libres/ocupados) en un archivo .pkl
-        with open(spaces_status_filename, 'wb') as f:
-            pickle.dump((free_spaces, occupied_spaces), f)
+        # Publicar el estado de los espacios (libres/ocupados) para la interfaz
+        with profiler.stage('publish'):
+            publish_status(confidence)
 
         # Mostrar la imagen con los espacios de estacionamiento marcados
-        cv2.imshow("Image", img)
+        key = show_frame(img, occupied, free_spaces, headless)
+        profiler.end_frame()
+        frames_counter.inc()
 
         # Presionar 'q' para salir del bucle
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        if key == ord('q'):
             break
 
+    print(gate.report())
+    print(profiler.report())
     cap.release()
-    cv2.destroyAllWindows()
+    if not headless:
+        cv2.destroyAllWindows()
+
+# Igual que process_frame, pero con captura, inferencia y dibujo en etapas separadas
+# conectadas por colas que descartan los fotogramas viejos
+def process_frame_pipeline(headless=False):
+    cap = open_camera()
+    if cap is None:
+        return
+
+    gate = MotionGate(MOTION_THRESHOLD, MAX_INFERENCE_INTERVAL)
+    # Estado de cada hilo: la inferencia solo lee las posiciones (bajo layout_lock) y el dibujo
+    # es el único que las recarga y el único que toca el filtro, start_times y las sesiones
+    last = {'detection': None, 'version': layout.mtime, 'inferences': 0}
+    seen = {'inference': 0, 'occupied': None}
+
+    # Etapa de captura (hilo propio); al pedir la detención se corta y el pipeline se vacía
+    def capture():
+        if stop_event.is_set():
+            return None
+        success, img = cap.read()
+        if not success:
+            print("Error al capturar el fotograma.")
+            return None
+        return img
+
+    # Etapa de inferencia (hilo propio): YOLO solo cuando hubo movimiento. Devuelve la
+    # confianza sin filtrar junto con la versión de las posiciones con la que se calculó.
+    def infer(img):
+        with layout_lock:
+            if layout.mtime != last['version']:
+                last['version'] = layout.mtime
+                gate.reset()
+            if gate.should_infer(img, layout.label_map(img.shape)):
+                last['inferences'] += 1
+                last['detection'] = (layout.mtime, last['inferences'], detectConfidence(img))
+        return last['detection']
+
+    # Etapa de dibujo y publicación (hilo principal)
+    def render(img, detection):
+        with layout_lock:
+            refresh_positions()
+        version, inference, confidence = detection
+        if version != layout.mtime or len(confidence) != len(posList):
+            return True  # Las posiciones se acaban de recargar; esperar la próxima inferencia
+        # El filtro avanza una vez por inferencia, igual que en process_frame
+        if inference != seen['inference']:
+            seen['inference'] = inference
+            seen['occupied'] = space_filter.update(confidence)
+        occupied = seen['occupied']
+        with profiler.stage('check_spaces'):
+            free_spaces, occupied_spaces = checkSpaces(img, occupied, draw=False)
+        with profiler.stage('publish'):
+            publish_status(confidence)
+        key = show_frame(img, occupied, free_spaces, headless)
+        profiler.end_frame()
+        frames_counter.inc()
+        return key != ord('q') and not stop_event.is_set()
+
+    pipeline = Pipeline(capture, infer, render)
+    metrics.counter('dropped_frames_total', "Fotogramas descartados por las colas del pipeline",
+                    fn=lambda: pipeline.frames.dropped + pipeline.results.dropped)
+    pipeline.run()
+
+    print(gate.report())
+    print(pipeline.report())
+    print(profiler.report())
+    cap.release()
+    if not headless:
+        cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    process_frame()
+    parser = argparse.ArgumentParser(description="Detección de espacios de estacionamiento")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Captura, inferencia y dibujo en hilos separados")
+    parser.add_argument('--profile', type=int, default=0, metavar='N',
+                        help="Perfilar con cProfile los primeros N fotogramas")
+    parser.add_argument('--no-timers', action='store_true', help="Desactivar los tiempos por etapa")
+    parser.add_argument('--headless', action='store_true', help="Sin ventana: no dibujar ni mostrar los fotogramas")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help="Puerto del endpoint de métricas (0 para desactivarlo)")
+    parser.add_argument('--metrics-host', default=METRICS_HOST,
+                        help="Dirección en la que escucha el endpoint de métricas (0.0.0.0 para todas)")
+    parser.add_argument('--snapshot', action='store_true',
+                        help="Publicar /snapshot.jpg y /stream.mjpg en el puerto de métricas")
+    args = parser.parse_args()
+
+    metrics_server = None
+    if args.metrics_port:
+        try:
+            metrics_server = MetricsServer(metrics, host=args.metrics_host, port=args.metrics_port)
+        except OSError as e:
+            # Puerto ocupado (otro main5.py o server.py): el detector sigue sin métricas
+            print(f"No se pudo abrir el endpoint de métricas en {args.metrics_host}:{args.metrics_port} ({e}); "
+                  f"se continúa sin métricas.")
+    if metrics_server is not None:
+        if args.snapshot:
+            snapshot.add_routes(metrics_server)
+        metrics_server.start()
+
+    profiler.enabled = not args.no_timers
+    profiler.install_signals()
+    install_shutdown_handlers()
+    if args.profile:
+        profiler.request_profile(args.profile)
+
+    try:
+        if args.pipeline:
+            process_frame_pipeline(args.headless)
+        else:
+            process_frame(args.headless)
+    except KeyboardInterrupt:
+        pass
 
-    # Cerrar la conexión con la base de datos al final
-    conn.close()
+    # Escribir los registros pendientes y cerrar la conexión con la base de datos al final.
+    # Las sesiones abiertas quedan guardadas para retomarlas en el próximo inicio.
+    snapshot.close()
+    log_writer.stop()
+    session_store.settle(log_writer.take_durable())
+    session_store.close()
+    status_writer.close()
+    if metrics_server is not None:
+        metrics_server.stop()
+    print("Detector detenido.")
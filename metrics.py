@@ -0,0 +1,249 @@
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Métricas del servicio de ocupación en formato de texto de Prometheus, servidas por HTTP
+# desde un hilo en segundo plano (GET /metrics). El ciclo de fotogramas solo incrementa
+# contadores u observa histogramas (una suma bajo un lock); los valores que ya existen en
+# otros objetos (cola de parking_log, espacios libres, descartes) se leen con funciones
+# al momento de la consulta, sin costo para el ciclo.
+#
+# Por defecto solo escucha en 127.0.0.1; para que Prometheus lo consulte desde otra
+# máquina hay que pasar host='0.0.0.0' (o la dirección de la interfaz) explícitamente.
+#
+# Prueba local:  curl http://localhost:9108/metrics
+
+# Límites de los histogramas de latencia, en segundos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+# Valor de etiqueta con los escapes del formato de texto: barra invertida, comillas y salto de línea
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Texto de ayuda (# HELP): se escapan la barra invertida y el salto de línea
+def _escape_help(text):
+    return str(text).replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    items = ','.join(f'{key}="{_escape_label(value)}"' for key, value in sorted(labels.items()))
+    return '{' + items + '}'
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if not value.is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, labels, fn=None):
+        self.labels = labels
+        self.fn = fn              # Si se da, el valor se lee de fn() al consultar
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name):
+        value = self.fn() if self.fn is not None else self.value
+        return [(name, self.labels, value)]
+
+
+class Gauge(Counter):
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    def __init__(self, labels, buckets=LATENCY_BUCKETS):
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # El último es +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self, name):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        samples = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            cumulative += n
+            samples.append((f'{name}_bucket', dict(self.labels, le=_format_value(bound)), cumulative))
+        samples.append((f'{name}_sum', self.labels, total))
+        samples.append((f'{name}_count', self.labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self, prefix='parking_'):
+        self.prefix = prefix
+        self._families = {}       # nombre -> (tipo, ayuda, {etiquetas: métrica})
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _metric(self, kind, name, help_text, labels, factory):
+        name = self.prefix + name
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help_text, {}))
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = factory(dict(key))
+        return metric
+
+    # Contador (solo crece). Con fn el valor se toma de fn() en cada consulta
+    def counter(self, name, help_text, labels=None, fn=None):
+        metric = self._metric('counter', name, help_text, labels, lambda l: Counter(l, fn))
+        if fn is not None:
+            metric.fn = fn
+        return metric
+
+    # Valor que sube y baja. Con fn el valor se toma de fn() en cada consulta
+    def gauge(self, name, help_text, labels=None, fn=None):
+        metric = self._metric('gauge', name, help_text, labels, lambda l: Gauge(l, fn))
+        if fn is not None:
+            metric.fn = fn
+        return metric
+
+    def histogram(self, name, help_text, labels=None, buckets=LATENCY_BUCKETS):
+        return self._metric('histogram', name, help_text, labels, lambda l: Histogram(l, buckets))
+
+    # Colector: fn() devuelve [(nombre, tipo, ayuda, [(etiquetas, valor), ...]), ...]
+    def add_collector(self, fn):
+        self._collectors.append(fn)
+
+    # Texto en formato de exposición de Prometheus
+    def render(self):
+        lines = []
+        with self._lock:
+            families = [(name, kind, help_text, list(metrics.values()))
+                        for name, (kind, help_text, metrics) in self._families.items()]
+        for name, kind, help_text, metrics in families:
+            samples = []
+            for metric in metrics:
+                try:
+                    samples.extend(metric.samples(name))
+                except Exception:
+                    continue  # Un valor que no se pudo leer no rompe la consulta
+            lines.append(f'# HELP {name} {_escape_help(help_text)}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(f'{sample}{_format_labels(labels)} {_format_value(value)}'
+                         for sample, labels, value in samples)
+        for collector in self._collectors:
+            try:
+                collected = collector()
+            except Exception:
+                continue
+            for name, kind, help_text, values in collected:
+                name = self.prefix + name
+                lines.append(f'# HELP {name} {_escape_help(help_text)}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.extend(f'{name}{_format_labels(labels)} {_format_value(value)}' for labels, value in values)
+        return '\n'.join(lines) + '\n'
+
+
+# Función para un gauge que informa el ritmo (por segundo) de un contador entre dos consultas
+def rate_of(counter):
+    state = {'value': counter.value, 'time': time.monotonic(), 'rate': 0.0}
+
+    def rate():
+        now = time.monotonic()
+        elapsed = now - state['time']
+        if elapsed >= 1.0:
+            state['rate'] = (counter.value - state['value']) / elapsed
+            state['value'], state['time'] = counter.value, now
+        return state['rate']
+    return rate
+
+
+# Percentiles de las etapas de un Profiler (profiling.py) como métrica de tipo summary
+def profiler_collector(profiler):
+    def collect():
+        values = []
+        counts = []
+        for stage, s in profiler.summary().items():
+            for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms')):
+                values.append(({'stage': stage, 'quantile': quantile}, s[key] / 1000))
+            counts.append(({'stage': stage}, s['count']))
+        return [('stage_seconds', 'summary', "Latencia por etapa del ciclo de detección", values),
+                ('stage_runs_total', 'counter', "Ejecuciones de cada etapa", counts)]
+    return collect
+
+
+class MetricsServer:
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        self.registry = registry
+        self.host = host
+        self.routes = {'/metrics': self._serve_metrics, '/': self._serve_metrics}
+        routes = self.routes
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                route = routes.get(self.path.split('?')[0])
+                if route is None:
+                    self.send_error(404)
+                    return
+                route(self)
+
+            def log_message(self, format, *args):
+                pass  # Sin una línea en consola por cada consulta
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def _serve_metrics(self, handler):
+        body = self.registry.render().encode('utf-8')
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    # Agregar una ruta: fn(handler) recibe el BaseHTTPRequestHandler y escribe la respuesta
+    def add_route(self, path, fn):
+        self.routes[path] = fn
+
+    # Puerto en uso (útil con port=0, que elige uno libre)
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metricas', daemon=True)
+        self._thread.start()
+        print(f"Métricas en http://{self.host}:{self.port}/metrics")
+        for path in self.routes:
+            if path not in ('/metrics', '/'):
+                print(f"  también http://{self.host}:{self.port}{path}")
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self._server.server_close()
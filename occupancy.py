@@ -0,0 +1,454 @@
+import os
+import pickle
+import cv2
+import numpy as np
+from spatial_index import SpatialGrid
+
+# Motor de ocupación vectorizado: en lugar de llamar a cv2.pointPolygonTest una vez
+# por cada par (espacio, auto), todos los polígonos de CarParkPos.pkl se guardan en un
+# solo arreglo y todos los centros de los autos se prueban contra ellos de una vez.
+
+
+# Convertir la lista de posiciones (posList) en un arreglo (N, K, 2) de vértices
+def build_polygons(pos_list):
+    if len(pos_list) == 0:
+        return np.zeros((0, 1, 2), np.float64)
+
+    max_vertices = max(len(pos) for pos in pos_list)
+    polygons = np.empty((len(pos_list), max_vertices, 2), np.float64)
+    for i, pos in enumerate(pos_list):
+        pts = np.asarray(pos, np.float64).reshape(-1, 2)
+        polygons[i, :len(pts)] = pts
+        # Rellenar con el último vértice: los lados de longitud cero no afectan la prueba
+        polygons[i, len(pts):] = pts[-1]
+    return polygons
+
+
+# Extraer las cajas (x1, y1, x2, y2) de los resultados de YOLO como un solo arreglo NumPy
+def boxes_from_results(results, classes=None):
+    chunks = []
+    for result in results:
+        boxes = result.boxes
+        xyxy = boxes.xyxy.cpu().numpy()
+        if classes is not None:
+            cls = boxes.cls.cpu().numpy().astype(np.int64)
+            xyxy = xyxy[np.isin(cls, classes)]
+        chunks.append(xyxy.reshape(-1, 4))
+
+    if not chunks:
+        return np.zeros((0, 4), np.float32)
+    return np.concatenate(chunks)
+
+
+# Calcular los centros enteros de las cajas, igual que (x1 + x2) // 2 en checkSpaces
+def box_centers(boxes):
+    coords = np.asarray(boxes).reshape(-1, 4).astype(np.int64)
+    centers_x = (coords[:, 0] + coords[:, 2]) // 2
+    centers_y = (coords[:, 1] + coords[:, 3]) // 2
+    return np.stack([centers_x, centers_y], axis=1)
+
+
+# Prueba par-impar con los lados (a -> b) de los polígonos en el eje 1 y los puntos (px, py)
+# combinables con ellos; reduce el eje de los lados. Los puntos sobre el borde cuentan
+# como dentro, igual que pointPolygonTest(...) >= 0.
+def _inside_edges(ax, ay, bx, by, px, py):
+    # Regla par-impar: contar cuántos lados cruza un rayo horizontal hacia la derecha
+    straddles = (ay > py) != (by > py)
+    dy = np.where(by == ay, 1.0, by - ay)
+    x_cross = ax + (py - ay) * (bx - ax) / dy
+    crossings = np.count_nonzero(straddles & (px < x_cross), axis=1)
+    inside = (crossings % 2) == 1
+
+    # Puntos exactamente sobre algún lado del polígono
+    cross = (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+    on_edge = (
+        (cross == 0)
+        & (px >= np.minimum(ax, bx)) & (px <= np.maximum(ax, bx))
+        & (py >= np.minimum(ay, by)) & (py <= np.maximum(ay, by))
+    ).any(axis=1)
+
+    return inside | on_edge
+
+
+# Matriz (N espacios, M puntos) que indica si cada punto está dentro de cada polígono.
+def points_in_polygons(points, polygons):
+    points = np.asarray(points, np.float64).reshape(-1, 2)
+    n_spaces = polygons.shape[0]
+    if n_spaces == 0 or len(points) == 0:
+        return np.zeros((n_spaces, len(points)), bool)
+
+    # Lados de cada polígono: (a -> b), con forma (N, K, 1) para combinar con los M puntos
+    ax = polygons[:, :, 0, None]
+    ay = polygons[:, :, 1, None]
+    bx = np.roll(polygons, -1, axis=1)[:, :, 0, None]
+    by = np.roll(polygons, -1, axis=1)[:, :, 1, None]
+    return _inside_edges(ax, ay, bx, by, points[None, None, :, 0], points[None, None, :, 1])
+
+
+# Vector (P,) que indica si cada punto está dentro del polígono de su par: points[p] contra
+# polygons[spaces[p]]. Sirve para probar solo los candidatos de un índice espacial.
+def points_in_polygon_pairs(points, polygons, spaces):
+    points = np.asarray(points, np.float64).reshape(-1, 2)
+    if len(points) == 0:
+        return np.zeros(0, bool)
+    edges = polygons[spaces]
+    following = np.roll(edges, -1, axis=1)
+    return _inside_edges(edges[:, :, 0], edges[:, :, 1], following[:, :, 0], following[:, :, 1],
+                         points[:, 0, None], points[:, 1, None])
+
+
+# Vector booleano de ocupación: un espacio está ocupado si contiene el centro de algún auto
+def check_occupancy(centers, polygons):
+    return points_in_polygons(centers, polygons).any(axis=1)
+
+
+# Rasterizar todos los polígonos una sola vez en un mapa de etiquetas int16:
+# cada píxel guarda el índice del espacio al que pertenece, o -1 si no pertenece a ninguno
+def build_label_map(polygons, shape):
+    label_map = np.full(shape[:2], -1, np.int16)
+    for i, polygon in enumerate(polygons):
+        pts = np.round(polygon).astype(np.int32).reshape((-1, 1, 2))
+        cv2.fillPoly(label_map, [pts], i)
+    return label_map
+
+
+# Índice del espacio de cada punto con un solo acceso al arreglo (-1 si cae fuera)
+def lookup_spaces(label_map, points):
+    points = np.asarray(points).reshape(-1, 2).astype(np.int64)
+    height, width = label_map.shape
+    labels = np.full(len(points), -1, np.int64)
+    valid = (points[:, 0] >= 0) & (points[:, 0] < width) & (points[:, 1] >= 0) & (points[:, 1] < height)
+    labels[valid] = label_map[points[valid, 1], points[valid, 0]]
+    return labels
+
+
+# Vector booleano de ocupación a partir del mapa de etiquetas
+def occupancy_from_labels(label_map, points, n_spaces):
+    labels = lookup_spaces(label_map, points)
+    occupied = np.zeros(n_spaces, bool)
+    occupied[labels[labels >= 0]] = True
+    return occupied
+
+
+# Tablas de áreas acumuladas (imagen integral) de la máscara de cada espacio, recortada a
+# su rectángulo envolvente. Con ellas el área de intersección entre cualquier caja y el
+# polígono se obtiene con cuatro accesos, sin recorrer píxeles. Cada tabla tiene su propio
+# tamaño, una detrás de otra en un solo arreglo plano ('offset' y 'stride' por espacio),
+# así un espacio grande cerca de la cámara no agranda las tablas de todos los demás.
+def build_overlap_tables(polygons):
+    n_spaces = len(polygons)
+    if n_spaces == 0:
+        return {'origin': np.zeros((0, 2), np.int64), 'size': np.zeros((0, 2), np.int64),
+                'integrals': np.zeros(0, np.int32), 'offset': np.zeros(0, np.int64),
+                'stride': np.zeros(0, np.int64), 'area': np.zeros(0, np.float64)}
+
+    pts = np.round(polygons).astype(np.int64)
+    origin = pts.min(axis=1)
+    size = pts.max(axis=1) - origin + 1  # (ancho, alto) de cada rectángulo envolvente
+    stride = size[:, 0] + 1
+    lengths = stride * (size[:, 1] + 1)
+    offset = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+    integrals = np.zeros(int(lengths.sum()), np.int32)
+    for i in range(n_spaces):
+        w, h = size[i]
+        mask = np.zeros((h, w), np.uint8)
+        cv2.fillPoly(mask, [(pts[i] - origin[i]).astype(np.int32).reshape((-1, 1, 2))], 1)
+        integrals[offset[i]:offset[i] + lengths[i]] = cv2.integral(mask).reshape(-1)
+
+    area = integrals[offset + lengths - 1].astype(np.float64)
+    return {'origin': origin, 'size': size, 'integrals': integrals, 'offset': offset, 'stride': stride,
+            'area': area}
+
+
+# Área en píxeles de la intersección de cada par (caja cars[p], polígono spaces[p]);
+# las cajas ya redondeadas a enteros
+def _pair_areas(boxes, tables, spaces, cars):
+    # Recortar cada caja al rectángulo de su espacio, en coordenadas locales
+    origin = tables['origin'][spaces]
+    size = tables['size'][spaces]
+    lo = np.clip(boxes[cars, :2] - origin, 0, size)
+    hi = np.clip(boxes[cars, 2:] + 1 - origin, 0, size)
+
+    flat = tables['integrals']
+    stride = tables['stride'][spaces]
+    base = tables['offset'][spaces]
+    x1, y1 = lo[:, 0], lo[:, 1]
+    x2, y2 = hi[:, 0], hi[:, 1]
+    return (flat[base + y2 * stride + x2] - flat[base + y1 * stride + x2]
+            - flat[base + y2 * stride + x1] + flat[base + y1 * stride + x1]).astype(np.float64)
+
+
+# Matriz (N espacios, M cajas) con el área en píxeles de la intersección caja/polígono
+def intersection_areas(boxes, tables):
+    boxes = np.round(np.asarray(boxes, np.float64).reshape(-1, 4)).astype(np.int64)
+    n_spaces = len(tables['area'])
+    inter = np.zeros((n_spaces, len(boxes)), np.float64)
+    if n_spaces == 0 or len(boxes) == 0:
+        return inter
+
+    origin = tables['origin']
+    end = origin + tables['size']
+    # Solo los pares cuyos rectángulos se tocan pueden tener intersección distinta de cero
+    touching = ((boxes[None, :, 0] < end[:, None, 0]) & (boxes[None, :, 2] >= origin[:, None, 0])
+                & (boxes[None, :, 1] < end[:, None, 1]) & (boxes[None, :, 3] >= origin[:, None, 1]))
+    spaces, cars = np.nonzero(touching)
+    if len(spaces) == 0:
+        return inter
+    inter[spaces, cars] = _pair_areas(boxes, tables, spaces, cars)
+    return inter
+
+
+# Matriz (N, M) de superposición: fracción del espacio cubierta por la caja ('space')
+# o intersección sobre unión ('iou')
+def overlap_ratios(boxes, tables, metric='space'):
+    inter = intersection_areas(boxes, tables)
+    space_area = tables['area'][:, None]
+    if metric == 'iou':
+        boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+        box_area = ((boxes[:, 2] - boxes[:, 0] + 1) * (boxes[:, 3] - boxes[:, 1] + 1))[None, :]
+        union = space_area + box_area - inter
+        return inter / np.maximum(union, 1)
+    return inter / np.maximum(space_area, 1)
+
+
+# Vector booleano de ocupación por superposición: la mejor caja de cada espacio
+# debe cubrir al menos `threshold` del espacio
+def check_overlap_occupancy(boxes, tables, threshold=0.4, metric='space'):
+    ratios = overlap_ratios(boxes, tables, metric)
+    if ratios.shape[1] == 0:
+        return np.zeros(ratios.shape[0], bool)
+    return ratios.max(axis=1) >= threshold
+
+
+# Confianza de ocupación por espacio: la mayor confianza entre los autos cuyo centro cae
+# en el espacio (0 si no hay ninguno)
+def confidence_from_labels(label_map, points, confidences, n_spaces):
+    labels = lookup_spaces(label_map, points)
+    inside = labels >= 0
+    confidence = np.zeros(n_spaces, np.float64)
+    np.maximum.at(confidence, labels[inside], np.asarray(confidences, np.float64)[inside])
+    return confidence
+
+
+# Confianza de ocupación por superposición: la mayor confianza entre las cajas que cubren
+# al menos `threshold` del espacio (0 si no hay ninguna)
+def overlap_confidence(boxes, confidences, tables, threshold=0.4, metric='space'):
+    ratios = overlap_ratios(boxes, tables, metric)
+    if ratios.shape[1] == 0:
+        return np.zeros(ratios.shape[0], np.float64)
+    scores = np.where(ratios >= threshold, np.asarray(confidences, np.float64)[None, :], 0.0)
+    return scores.max(axis=1)
+
+
+# Confianza de ocupación por superposición calculada solo sobre los pares (espacio, caja)
+# dados, por ejemplo los candidatos de un índice espacial; igual a overlap_confidence si
+# los pares incluyen todos los que se tocan
+def overlap_pairs_confidence(boxes, confidences, tables, spaces, cars, threshold=0.4, metric='space'):
+    confidence = np.zeros(len(tables['area']), np.float64)
+    if len(spaces) == 0:
+        return confidence
+    boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+    inter = _pair_areas(np.round(boxes).astype(np.int64), tables, spaces, cars)
+    space_area = tables['area'][spaces]
+    if metric == 'iou':
+        box_area = (boxes[cars, 2] - boxes[cars, 0] + 1) * (boxes[cars, 3] - boxes[cars, 1] + 1)
+        ratios = inter / np.maximum(space_area + box_area - inter, 1)
+    else:
+        ratios = inter / np.maximum(space_area, 1)
+    hit = ratios >= threshold
+    np.maximum.at(confidence, spaces[hit], np.asarray(confidences, np.float64)[cars[hit]])
+    return confidence
+
+
+# Confianza de ocupación por espacio a partir de los centros de los autos, con la prueba
+# exacta de punto en polígono solo sobre los candidatos de la grilla. Mismo resultado que
+# points_in_polygons contra todos los espacios.
+def grid_confidence(grid, polygons, points, confidences):
+    confidence = np.zeros(grid.n_spaces, np.float64)
+    queries, spaces = grid.point_candidates(points)
+    inside = points_in_polygon_pairs(np.asarray(points, np.float64).reshape(-1, 2)[queries], polygons, spaces)
+    np.maximum.at(confidence, spaces[inside], np.asarray(confidences, np.float64)[queries[inside]])
+    return confidence
+
+
+# Confianza de ocupación por superposición calculada solo sobre los pares de la grilla
+def grid_overlap_confidence(grid, boxes, confidences, tables, threshold=0.4, metric='space'):
+    cars, spaces = grid.box_candidates(boxes)
+    return overlap_pairs_confidence(boxes, confidences, tables, spaces, cars, threshold, metric)
+
+
+# Rectángulo envolvente (x1, y1, x2, y2) de cada espacio, ampliado con un margen y
+# recortado a la imagen. El margen deja espacio para la parte del auto fuera del polígono.
+def space_rects(polygons, shape, margin=40):
+    height, width = shape[:2]
+    lo = np.floor(polygons.min(axis=1)) - margin
+    hi = np.ceil(polygons.max(axis=1)) + margin
+    rects = np.concatenate([lo, hi], axis=1).astype(np.int64)
+    rects[:, [0, 2]] = np.clip(rects[:, [0, 2]], 0, width)
+    rects[:, [1, 3]] = np.clip(rects[:, [1, 3]], 0, height)
+    return rects
+
+
+# Rectángulo que cubre todos los espacios
+def union_rect(rects):
+    return (int(rects[:, 0].min()), int(rects[:, 1].min()), int(rects[:, 2].max()), int(rects[:, 3].max()))
+
+
+def _area(rect):
+    return max(0, rect[2] - rect[0]) * max(0, rect[3] - rect[1])
+
+
+# Unir en una sola región cada grupo de rectángulos que se superponen (componentes conexas),
+# repitiendo hasta que ninguna región toque a otra
+def merge_overlapping(rects):
+    rects = np.asarray(rects, np.int64).reshape(-1, 4)
+    while len(rects) > 1:
+        touching = ((rects[:, None, 0] < rects[None, :, 2]) & (rects[None, :, 0] < rects[:, None, 2])
+                    & (rects[:, None, 1] < rects[None, :, 3]) & (rects[None, :, 1] < rects[:, None, 3]))
+        # Propagar la etiqueta mínima de cada componente
+        labels = np.arange(len(rects))
+        while True:
+            new_labels = np.where(touching, labels[None, :], len(rects)).min(axis=1)
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+        groups = np.unique(labels)
+        if len(groups) == len(rects):
+            break
+        rects = np.array([np.concatenate([rects[labels == g, :2].min(axis=0), rects[labels == g, 2:].max(axis=0)])
+                          for g in groups])
+    return rects
+
+
+# Agrupar los rectángulos de los espacios en pocas regiones: se unen los que se tocan y,
+# si quedan más de max_tiles, se fusionan los pares que menos área agregan
+def crop_regions(polygons, shape, margin=40, max_tiles=4):
+    rects = space_rects(polygons, shape, margin)
+    # Los espacios que quedan fuera del fotograma (posiciones marcadas para otra resolución)
+    # no tienen nada que recortar; sin ninguno dentro no hay regiones
+    rects = rects[(rects[:, 2] > rects[:, 0]) & (rects[:, 3] > rects[:, 1])]
+    if len(rects) == 0:
+        return []
+    regions = [tuple(int(v) for v in rect) for rect in merge_overlapping(rects)]
+
+    # Reducir el número de regiones fusionando el par más barato
+    while len(regions) > max_tiles:
+        best = None
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                union = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                cost = _area(union) - _area(a) - _area(b)
+                if best is None or cost < best[0]:
+                    best = (cost, i, j, union)
+        _, i, j, union = best
+        regions[i] = union
+        del regions[j]
+        regions = [tuple(int(v) for v in rect) for rect in merge_overlapping(regions)]
+
+    # Si las regiones cubren casi lo mismo que su unión, una sola llamada es más barata
+    total = sum(_area(r) for r in regions)
+    whole = union_rect(np.array(regions))
+    if total >= 0.8 * _area(whole):
+        return [whole]
+    return regions
+
+
+# Espacios desde los que la superposición se calcula con la grilla en lugar de la matriz
+# completa (python spatial_index.py: con 100 espacios la matriz tarda 0.2 ms y la grilla
+# 0.34 ms; se cruzan cerca de 250 y con 500 la grilla ya tarda menos de la mitad)
+GRID_MIN_SPACES = 256
+
+
+# Cargar la lista de posiciones guardada por 2.py
+def load_positions(filename):
+    with open(filename, 'rb') as f:
+        return pickle.load(f)
+
+
+# Posiciones de los espacios con sus polígonos y mapa de etiquetas en caché.
+# El mapa solo se vuelve a rasterizar cuando 2.py escribe nuevas posiciones.
+class SpaceLayout:
+    def __init__(self, filename):
+        self.filename = filename
+        self.mtime = os.path.getmtime(filename)
+        self.pos_list = load_positions(filename)
+        self.polygons = build_polygons(self.pos_list)
+        self._label_map = None
+        self._overlap_tables = None
+        self._regions = None
+        self._spatial_index = None
+
+    # Recargar las posiciones si el archivo cambió; devuelve True si hubo cambios
+    def refresh(self):
+        try:
+            mtime = os.path.getmtime(self.filename)
+            if mtime == self.mtime:
+                return False
+            pos_list = load_positions(self.filename)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            # Archivo ausente o a medio escribir: conservar las posiciones actuales
+            return False
+
+        self.mtime = mtime
+        self.pos_list = pos_list
+        self.polygons = build_polygons(pos_list)
+        self._label_map = None
+        self._overlap_tables = None
+        self._regions = None
+        self._spatial_index = None
+        return True
+
+    # Mapa de etiquetas para el tamaño de imagen dado (se reconstruye solo si cambia)
+    def label_map(self, shape):
+        if self._label_map is None or self._label_map.shape != tuple(shape[:2]):
+            self._label_map = build_label_map(self.polygons, shape)
+        return self._label_map
+
+    # Ocupación de todos los espacios a partir de los centros de los autos
+    def occupancy(self, centers, shape):
+        return occupancy_from_labels(self.label_map(shape), centers, len(self.pos_list))
+
+    # Tablas de superposición de los espacios (se calculan una vez por juego de posiciones)
+    def overlap_tables(self):
+        if self._overlap_tables is None:
+            self._overlap_tables = build_overlap_tables(self.polygons)
+        return self._overlap_tables
+
+    # Grilla de los rectángulos de los espacios (se construye una vez por juego de posiciones)
+    def spatial_index(self):
+        if self._spatial_index is None:
+            self._spatial_index = SpatialGrid(self.polygons)
+        return self._spatial_index
+
+    # Ocupación de todos los espacios según la superposición con las cajas de los autos
+    def overlap_occupancy(self, boxes, threshold=0.4, metric='space'):
+        boxes = np.asarray(boxes).reshape(-1, 4)
+        return self.overlap_confidence(boxes, np.ones(len(boxes)), threshold, metric) > 0
+
+    # Regiones de recorte que cubren todos los espacios (se calculan una vez por tamaño de imagen)
+    def crop_regions(self, shape, margin=40, max_tiles=4):
+        key = (tuple(shape[:2]), margin, max_tiles)
+        if self._regions is None or self._regions[0] != key:
+            self._regions = (key, crop_regions(self.polygons, shape, margin, max_tiles))
+        return self._regions[1]
+
+    # Confianza de ocupación de cada espacio a partir de los centros y confianzas de los autos
+    def occupancy_confidence(self, centers, confidences, shape):
+        return confidence_from_labels(self.label_map(shape), centers, confidences, len(self.pos_list))
+
+    # Confianza de ocupación de cada espacio a partir de los centros, sin mapa de etiquetas:
+    # prueba exacta solo contra los espacios de la grilla cercanos a cada centro. Para
+    # panorámicas en las que un mapa del tamaño de la imagen ocupa demasiada memoria.
+    def indexed_confidence(self, centers, confidences):
+        return grid_confidence(self.spatial_index(), self.polygons, centers, confidences)
+
+    # Confianza de ocupación de cada espacio según la superposición con las cajas. Con pocos
+    # espacios la matriz completa (espacio, caja) es más barata; desde GRID_MIN_SPACES solo se
+    # calculan los pares que la grilla da como cercanos
+    def overlap_confidence(self, boxes, confidences, threshold=0.4, metric='space'):
+        if len(self.pos_list) < GRID_MIN_SPACES:
+            return overlap_confidence(boxes, confidences, self.overlap_tables(), threshold, metric)
+        return grid_overlap_confidence(self.spatial_index(), boxes, confidences, self.overlap_tables(),
+                                       threshold, metric)
@@ -0,0 +1,158 @@
+import cv2
+import numpy as np
+
+# Clasificador por espacio para cámaras fijas, alternativa barata a correr YOLO sobre todo el
+# fotograma: cada espacio de CarParkPos.pkl es un cuadrilátero conocido, así que se lleva a
+# un parche rectangular normalizado con su homografía. Los mapas de todas las homografías
+# se calculan una vez y se juntan en uno solo, de modo que un único cv2.remap extrae los
+# parches de todos los espacios en un mosaico. El mosaico pasa luego por un solo llamado al
+# puntaje: por defecto la densidad de bordes (Canny) del interior del espacio, sin
+# aprendizaje, o un modelo chico que reciba el lote de parches y devuelva una probabilidad
+# por espacio.
+#
+#   python patches.py --sizes 36 300 2000
+
+
+# Cuatro esquinas de un espacio en el orden en que se marcaron; los polígonos que no tienen
+# cuatro vértices se aproximan con su rectángulo de área mínima
+def space_corners(pos):
+    points = np.asarray(pos, np.float32).reshape(-1, 2)
+    if len(points) == 4:
+        return points
+    return cv2.boxPoints(cv2.minAreaRect(points)).astype(np.float32)
+
+
+# Parches por fila del mosaico: remap no acepta imágenes de más de 32767 píxeles de lado,
+# así que los parches se acomodan en un mosaico casi cuadrado
+def mosaic_columns(n_spaces, patch_size):
+    width, height = patch_size
+    return max(1, int(np.ceil(np.sqrt(n_spaces * height / width))))
+
+
+# Mapas para cv2.remap con los parches de todos los espacios en mosaico: el parche del
+# espacio i ocupa la celda (i // columnas, i % columnas) y cada píxel (u, v) de la celda
+# apunta al píxel de la imagen correspondiente. `inset` recorta el borde del espacio (las
+# líneas pintadas) como fracción del lado.
+def build_patch_maps(pos_list, patch_size=(24, 48), inset=0.1):
+    width, height = patch_size
+    n_spaces = len(pos_list)
+    if n_spaces == 0:
+        empty = np.zeros((0, width), np.float32)
+        return empty, empty
+
+    # Parche normalizado -> cuadrilátero: las esquinas (0,0), (0,1), (1,1), (1,0) siguen el
+    # orden de los vértices, así el parche queda "parado" como el espacio en la imagen
+    unit = np.float32([[0, 0], [0, 1], [1, 1], [1, 0]])
+    homographies = np.stack([cv2.getPerspectiveTransform(unit, space_corners(pos)) for pos in pos_list])
+
+    u = inset + (1 - 2 * inset) * (np.arange(width) + 0.5) / width
+    v = inset + (1 - 2 * inset) * (np.arange(height) + 0.5) / height
+    grid_u, grid_v = np.meshgrid(u, v)
+    grid = np.stack([grid_u.ravel(), grid_v.ravel(), np.ones(width * height)])   # (3, alto * ancho)
+    mapped = homographies @ grid                                                 # (N, 3, alto * ancho)
+    columns = mosaic_columns(n_spaces, patch_size)
+    rows = -(-n_spaces // columns)
+    maps = np.full((2, rows * columns, height, width), -1, np.float32)  # Celdas sobrantes fuera de la imagen
+    maps[:, :n_spaces] = (mapped[:, :2] / mapped[:, 2:]).transpose(1, 0, 2).reshape(2, n_spaces, height, width)
+    maps = maps.reshape(2, rows, columns, height, width).transpose(0, 1, 3, 2, 4)
+    map_x, map_y = maps.reshape(2, rows * height, columns * width)
+    return np.ascontiguousarray(map_x), np.ascontiguousarray(map_y)
+
+
+class PatchClassifier:
+    def __init__(self, pos_list, patch_size=(24, 48), inset=0.1, low=0.02, high=0.08, model=None):
+        self.pos_list = pos_list
+        self.n_spaces = len(pos_list)
+        self.patch_size = patch_size
+        self.low = low        # Densidad de bordes de un espacio vacío (confianza 0)
+        self.high = high      # Densidad de bordes de un espacio ocupado (confianza 1)
+        self.model = model    # model(parches (N, alto, ancho, 3) uint8) -> (N,) probabilidades
+        map_x, map_y = build_patch_maps(pos_list, patch_size, inset)
+        # Mapas en punto fijo: remap más rápido que con los mapas float
+        self._maps = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2) if self.n_spaces else None
+
+    # Mosaico con los parches de todos los espacios, en una sola llamada a remap
+    def mosaic(self, img):
+        return cv2.remap(img, self._maps[0], self._maps[1], cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+
+    # Separar un mosaico (o una imagen derivada, como sus bordes) en un arreglo (N, alto, ancho, ...)
+    def split(self, mosaic):
+        width, height = self.patch_size
+        rows, columns = mosaic.shape[0] // height, mosaic.shape[1] // width
+        cells = mosaic.reshape(rows, height, columns, width, *mosaic.shape[2:]).swapaxes(1, 2)
+        return cells.reshape(rows * columns, height, width, *mosaic.shape[2:])[:self.n_spaces]
+
+    # Todos los parches: arreglo (N, alto, ancho, 3)
+    def patches(self, img):
+        width, height = self.patch_size
+        if self.n_spaces == 0:
+            return np.zeros((0, height, width) + img.shape[2:], img.dtype)
+        return self.split(self.mosaic(img))
+
+    # Fracción de píxeles con borde en cada parche (sin la fila y columna de cada lado,
+    # donde Canny ve el salto entre parches vecinos del mosaico)
+    def edge_density(self, mosaic):
+        width, height = self.patch_size
+        if self.n_spaces == 0:
+            return np.zeros(0, np.float64)
+        gray = cv2.cvtColor(mosaic, cv2.COLOR_BGR2GRAY) if mosaic.ndim == 3 else mosaic
+        edges = self.split(cv2.Canny(gray, 50, 150))[:, 1:-1, 1:-1]
+        return np.count_nonzero(edges, axis=(1, 2)) / float((height - 2) * (width - 2))
+
+    # Confianza de ocupación por espacio entre 0 y 1, para OccupancyFilter
+    def confidence(self, img):
+        if self.n_spaces == 0:
+            return np.zeros(0, np.float64)
+        mosaic = self.mosaic(img)
+        if self.model is not None:
+            return np.clip(np.asarray(self.model(self.split(mosaic)), np.float64).reshape(-1), 0.0, 1.0)
+        density = self.edge_density(mosaic)
+        return np.clip((density - self.low) / max(self.high - self.low, 1e-9), 0.0, 1.0)
+
+
+# Tiempo por fotograma y acierto sobre un estacionamiento sintético con autos dibujados
+if __name__ == "__main__":
+    import argparse
+    import time
+    from bench_occupancy import synthetic_lot
+    from bench_pipeline import synthetic_frame
+
+    parser = argparse.ArgumentParser(description="Clasificador de ocupación por parches")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[36, 300, 2000])
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'espacios':>9}{'construir':>11}{'parches':>10}{'puntaje':>10}{'total':>10}{'acierto':>10}")
+    for n_spaces in args.sizes:
+        pos_list = synthetic_lot(n_spaces)
+        img = cv2.GaussianBlur(synthetic_frame(pos_list), (0, 0), 3)
+        for pos in pos_list:
+            cv2.polylines(img, [np.array(pos, np.int32).reshape(-1, 1, 2)], True, (230, 230, 230), 2)
+
+        # Autos: carrocería, parabrisas y luneta dentro de la mitad de los espacios
+        truth = rng.random(n_spaces) < 0.5
+        for i in np.flatnonzero(truth):
+            x0, y0 = np.asarray(pos_list[i]).min(axis=0) + (14, 12)
+            color = tuple(int(c) for c in rng.integers(20, 230, 3))
+            cv2.rectangle(img, (int(x0), int(y0)), (int(x0) + 40, int(y0) + 86), color, -1)
+            for top in (18, 58):
+                cv2.rectangle(img, (int(x0) + 5, int(y0) + top), (int(x0) + 35, int(y0) + top + 14), (40, 40, 40), -1)
+
+        start = time.perf_counter()
+        classifier = PatchClassifier(pos_list)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        mosaic = classifier.mosaic(img)
+        timings = []
+        for fn in (lambda: classifier.mosaic(img), lambda: classifier.edge_density(mosaic),
+                   lambda: classifier.confidence(img)):
+            fn()
+            start = time.perf_counter()
+            for _ in range(args.repeats):
+                fn()
+            timings.append((time.perf_counter() - start) / args.repeats * 1000)
+
+        accuracy = np.mean((classifier.confidence(img) >= 0.5) == truth)
+        print(f"{n_spaces:>9}{build_ms:>11.2f}" + ''.join(f"{t:>10.3f}" for t in timings) + f"{accuracy:>10.1%}")
+    print("(ms; construir = una vez por juego de posiciones, el resto por fotograma)")
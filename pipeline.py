@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# Pipeline por etapas: captura, inferencia y dibujo/publicación corren por separado,
+# conectadas por colas acotadas que descartan el elemento más viejo. Así la inferencia
+# siempre trabaja con el fotograma más reciente y una etapa lenta no bloquea a las demás.
+
+
+# Cola acotada que descarta el elemento más antiguo cuando está llena
+class LatestQueue:
+    def __init__(self, maxsize=1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    # Devuelve el siguiente elemento, o None si la cola se cerró o se agotó el tiempo
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __len__(self):
+        return len(self._items)
+
+
+# Estadísticas de latencia de una etapa sobre una ventana móvil de muestras
+class StageStats:
+    def __init__(self, name, window=100):
+        self.name = name
+        self.count = 0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self._samples.append(seconds)
+
+    # Latencia promedio en milisegundos sobre la ventana reciente
+    @property
+    def mean_ms(self):
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(self._samples) / len(self._samples) * 1000
+
+    # Percentiles (0-100) de latencia en milisegundos sobre la ventana reciente
+    def percentiles_ms(self, qs=(50, 95, 99)):
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return [0.0] * len(qs)
+        return [float(v) * 1000 for v in np.percentile(samples, qs)]
+
+
+class Pipeline:
+    # capture_fn() -> fotograma o None al terminar
+    # infer_fn(fotograma) -> resultado
+    # render_fn(fotograma, resultado) -> False para detener el pipeline
+    def __init__(self, capture_fn, infer_fn, render_fn, queue_size=1):
+        self.capture_fn = capture_fn
+        self.infer_fn = infer_fn
+        self.render_fn = render_fn
+        self.frames = LatestQueue(queue_size)
+        self.results = LatestQueue(queue_size)
+        self.stats = {name: StageStats(name) for name in ('capture', 'inference', 'render')}
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            frame = self.capture_fn()
+            if frame is None:
+                break
+            self.stats['capture'].add(time.perf_counter() - start)
+            self.frames.put(frame)
+        self.frames.close()
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            frame = self.frames.get(timeout=0.5)
+            if frame is None:
+                if self.frames.closed:
+                    break
+                continue
+            start = time.perf_counter()
+            result = self.infer_fn(frame)
+            self.stats['inference'].add(time.perf_counter() - start)
+            self.results.put((frame, result))
+        self.results.close()
+
+    def start(self):
+        for target, name in ((self._capture_loop, 'captura'), (self._inference_loop, 'inferencia')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    # La etapa de dibujo corre en el hilo que llama (cv2.imshow debe usarse desde el hilo principal)
+    def run(self, report_every=10.0):
+        self.start()
+        last_report = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                item = self.results.get(timeout=0.5)
+                if item is None:
+                    if self.results.closed:
+                        break
+                    continue
+                start = time.perf_counter()
+                keep_going = self.render_fn(*item)
+                self.stats['render'].add(time.perf_counter() - start)
+                if keep_going is False:
+                    break
+                if report_every and time.monotonic() - last_report >= report_every:
+                    print(self.report())
+                    last_report = time.monotonic()
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        self.frames.close()
+        self.results.close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+
+    # Latencia por etapa y profundidad/descartes de cada cola
+    def report(self):
+        stages = ', '.join(f"{s.name}: {s.mean_ms:.1f} ms ({s.count})" for s in self.stats.values())
+        queues = (f"cola fotogramas: {len(self.frames)} (descartados {self.frames.dropped}), "
+                  f"cola resultados: {len(self.results)} (descartados {self.results.dropped})")
+        return f"{stages} | {queues}"
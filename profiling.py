@@ -0,0 +1,142 @@
+import cProfile
+import io
+import os
+import pstats
+import signal
+import threading
+import time
+from pipeline import StageStats
+
+# Instrumentación del ciclo de detección: temporizadores por etapa (captura, YOLO, ocupación,
+# dibujo, publicación, ...) con percentiles p50/p95/p99 sobre una ventana móvil, un reporte
+# periódico y una captura de cProfile a pedido. Un temporizador cuesta dos perf_counter y un
+# append, así que puede quedar encendido en producción.
+#
+# En Linux, con install_signals():
+#   kill -USR1 <pid>   imprime el reporte de etapas
+#   kill -USR2 <pid>   perfila con cProfile los próximos `profile_frames` fotogramas
+# cProfile solo mide el hilo que llama a end_frame (el hilo principal).
+
+
+# Temporizador de una etapa para usar con `with`
+class _StageTimer:
+    __slots__ = ('stats', 'start')
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.add(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Profiler:
+    def __init__(self, window=1000, enabled=True, report_every=None, profile_frames=200, output_dir='.'):
+        self.window = window
+        self.enabled = enabled
+        self.report_every = report_every      # Segundos entre reportes automáticos (None: nunca)
+        self.profile_frames = profile_frames
+        self.output_dir = output_dir
+        self.stats = {}
+        self.frames = 0
+        self._lock = threading.Lock()
+        self._last_report = time.monotonic()
+        self._report_requested = False
+        self._profile_requested = 0
+        self._profile = None
+        self._profile_left = 0
+
+    def _stage_stats(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.stats.setdefault(name, StageStats(name, self.window))
+        return stats
+
+    # Medir una etapa: `with profiler.stage('yolo'): ...`
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self._stage_stats(name))
+
+    # Registrar una duración medida por fuera (en segundos)
+    def add(self, name, seconds):
+        if self.enabled:
+            self._stage_stats(name).add(seconds)
+
+    # Pedir un reporte o una captura de cProfile; se atienden al final del próximo fotograma
+    def request_report(self):
+        self._report_requested = True
+
+    def request_profile(self, frames=None):
+        self._profile_requested = frames or self.profile_frames
+
+    # Conectar SIGUSR1 (reporte) y SIGUSR2 (cProfile); solo desde el hilo principal
+    def install_signals(self):
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.request_report())
+            signal.signal(signal.SIGUSR2, lambda signum, frame: self.request_profile())
+
+    # Marcar el final de un fotograma del ciclo principal: atiende los pedidos pendientes,
+    # avanza la captura de cProfile y hace el reporte periódico
+    def end_frame(self):
+        self.frames += 1
+
+        if self._profile is not None:
+            self._profile_left -= 1
+            if self._profile_left <= 0:
+                self._finish_profile()
+        elif self._profile_requested:
+            self._profile_left = self._profile_requested
+            self._profile_requested = 0
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+            print(f"Perfilando los próximos {self._profile_left} fotogramas con cProfile...")
+
+        now = time.monotonic()
+        if self._report_requested or (self.report_every and now - self._last_report >= self.report_every):
+            self._report_requested = False
+            self._last_report = now
+            print(self.report())
+
+    def _finish_profile(self):
+        self._profile.disable()
+        filename = os.path.join(self.output_dir, time.strftime('profile_%Y%m%d_%H%M%S.prof'))
+        self._profile.dump_stats(filename)
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats('cumulative').print_stats(20)
+        self._profile = None
+        print(out.getvalue())
+        print(f"Perfil guardado en {filename} (ver con: python -m pstats {filename})")
+
+    # Tabla de latencias por etapa: promedio y percentiles en milisegundos
+    def report(self):
+        lines = [f"{'etapa':<14}{'n':>8}{'media':>9}{'p50':>9}{'p95':>9}{'p99':>9}"]
+        for stats in list(self.stats.values()):
+            p50, p95, p99 = stats.percentiles_ms()
+            lines.append(f"{stats.name:<14}{stats.count:>8}{stats.mean_ms:>9.2f}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}")
+        return '\n'.join(lines)
+
+    # Resumen por etapa como dict, para exportar a otras herramientas
+    def summary(self):
+        result = {}
+        for stats in list(self.stats.values()):
+            p50, p95, p99 = stats.percentiles_ms()
+            result[stats.name] = {'count': stats.count, 'mean_ms': stats.mean_ms,
+                                  'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}
+        return result
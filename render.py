@@ -0,0 +1,233 @@
+import cv2
+import numpy as np
+
+# Dibujo barato de los espacios: los contornos, números y tiempos de ocupación se dibujan en
+# capas que se guardan entre fotogramas. La capa fija (contornos y números) solo se redibuja
+# en la zona de un espacio que cambió de estado; la de tiempos, solo en el texto que avanzó
+# un segundo, y a lo sumo `timer_budget` textos por fotograma (los tiempos de los autos que
+# llegaron juntos avanzan en el mismo fotograma; así se reparten entre los siguientes). Ambas
+# se combinan, en las zonas cambiadas, en una capa con una máscara binaria (el borde suavizado
+# del texto se corta a la mitad), y cada fotograma solo copia la capa donde la máscara está
+# encendida (cv2.copyTo), dentro del rectángulo que cubre los espacios.
+
+FREE_COLOR = (0, 200, 0)
+OCCUPIED_COLOR = (0, 0, 200)
+TEXT_COLOR = (255, 255, 255)
+FONT = cv2.FONT_HERSHEY_PLAIN
+MARGIN = 3  # Píxeles de más alrededor de cada zona (el texto suavizado se sale un poco)
+
+
+def format_elapsed(seconds):
+    hours, rem = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(rem, 60)
+    return f'{hours:02}:{minutes:02}:{seconds:02}'
+
+
+# Rectángulo (x1, y1, x2, y2) que ocupa un texto dibujado con putText en `org`
+def _text_rect(text, org, scale, thickness):
+    (width, height), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+    x, y = org
+    return (x - MARGIN, y - height - MARGIN, x + width + MARGIN, y + baseline + MARGIN)
+
+
+# Matriz (N, N) de rectángulos que se tocan
+def _touching(rects):
+    return ((rects[:, None, 0] < rects[None, :, 2]) & (rects[None, :, 0] < rects[:, None, 2])
+            & (rects[:, None, 1] < rects[None, :, 3]) & (rects[None, :, 1] < rects[:, None, 3]))
+
+
+class SpaceRenderer:
+    # timer_budget: tiempos redibujados como máximo por fotograma (por defecto, un cuarto de
+    # los espacios, al menos 32)
+    def __init__(self, pos_list, shape, alpha=1.0, timer_budget=None):
+        self.pos_list = pos_list
+        self.polygons = [np.array(pos, np.int32).reshape((-1, 1, 2)) for pos in pos_list]
+        self.shape = tuple(shape[:2])
+        self.alpha = alpha            # Opacidad de la capa sobre el fotograma (1 = opaca)
+        self.redrawn = 0              # Zonas redibujadas en total (para medir)
+        n_spaces = len(pos_list)
+        self.timer_budget = max(32, n_spaces // 4) if timer_budget is None else timer_budget
+        height, width = self.shape
+        self._static = np.zeros((height, width, 3), np.uint8)
+        self._static_mask = np.zeros((height, width), np.uint8)
+        self._timers = np.zeros((height, width, 3), np.uint8)
+        self._timer_mask = np.zeros((height, width), np.uint8)
+        self._sheet = np.zeros((height, width, 3), np.uint8)     # Hoja para redibujar tiempos
+        self._sheet_mask = np.zeros((height, width), np.uint8)
+        self._overlay = np.zeros((height, width, 3), np.uint8)   # Capas combinadas
+        self._mask = np.zeros((height, width), np.uint8)         # Máscara combinada (0 o 255)
+        self._occupied = np.zeros(n_spaces, bool)
+        self._seconds = np.full(n_spaces, -1, np.int64)  # Segundos mostrados (-1: sin tiempo)
+        self._drawn = False
+
+        # Zonas de cada espacio: contorno y número (capa fija) y tiempo 'HH:MM:SS' (capa de tiempos)
+        static_rects = []
+        timer_rects = []
+        for i, polygon in enumerate(self.polygons):
+            points = polygon.reshape(-1, 2)
+            outline = (points[:, 0].min() - MARGIN, points[:, 1].min() - MARGIN,
+                       points[:, 0].max() + MARGIN, points[:, 1].max() + MARGIN)
+            number = _text_rect(f'{i + 1}', self._number_org(polygon), 2, 2)
+            static_rects.append((min(outline[0], number[0]), min(outline[1], number[1]),
+                                 max(outline[2], number[2]), max(outline[3], number[3])))
+            timer_rects.append(_text_rect('00:00:00', self._timer_org(polygon), 1, 2))
+        self.static_rects = self._clip(static_rects)
+        self.timer_rects = self._clip(timer_rects)
+        self._static_neighbors = _touching(self.static_rects)
+        self._timer_neighbors = _touching(self.timer_rects)
+
+        # Rectángulo que cubre todo lo que se dibuja: fuera de él el fotograma no se toca
+        rects = np.concatenate([self.static_rects, self.timer_rects])
+        if len(rects):
+            self.bounds = (int(rects[:, 0].min()), int(rects[:, 1].min()), int(rects[:, 2].max()), int(rects[:, 3].max()))
+        else:
+            self.bounds = (0, 0, 0, 0)
+
+    def _clip(self, rects):
+        height, width = self.shape
+        rects = np.array(rects, np.int64).reshape(-1, 4)
+        rects[:, [0, 2]] = np.clip(rects[:, [0, 2]], 0, width)
+        rects[:, [1, 3]] = np.clip(rects[:, [1, 3]], 0, height)
+        return rects
+
+    @staticmethod
+    def _number_org(polygon):
+        return (int(polygon[2][0][0]) - 40, int(polygon[2][0][1]) - 10)
+
+    @staticmethod
+    def _timer_org(polygon):
+        return (int(polygon[0][0][0]), int(polygon[0][0][1]) - 10)
+
+    # Contorno y número de un espacio, desplazados por el origen de `layer`
+    def _draw_static(self, i, layer, mask, origin):
+        polygon = self.polygons[i] - np.array(origin, np.int32)
+        color = OCCUPIED_COLOR if self._occupied[i] else FREE_COLOR
+        cv2.polylines(layer, [polygon], isClosed=True, color=color, thickness=1)
+        cv2.polylines(mask, [polygon], isClosed=True, color=255, thickness=1)
+        org = self._number_org(polygon)
+        cv2.putText(layer, f'{i + 1}', org, FONT, 2, TEXT_COLOR, 2)
+        cv2.putText(mask, f'{i + 1}', org, FONT, 2, 255, 2)
+
+    # Tiempo de ocupación de un espacio, desplazado por el origen de `layer`
+    def _draw_timer(self, i, layer, mask, origin):
+        if self._seconds[i] < 0:
+            return
+        polygon = self.polygons[i] - np.array(origin, np.int32)
+        text = format_elapsed(self._seconds[i])
+        cv2.putText(layer, text, self._timer_org(polygon), FONT, 1, TEXT_COLOR, 2)
+        cv2.putText(mask, text, self._timer_org(polygon), FONT, 1, 255, 2)
+
+    # Redibujar la zona de un espacio: los vecinos que la tocan se dibujan en orden sobre una
+    # hoja que los contiene completos (así las líneas no se recortan distinto) y de ella se
+    # copia solo la zona
+    def _redraw_zone(self, j, rects, neighbors, draw, layer, mask):
+        nearby = np.flatnonzero(neighbors[j])
+        zx0, zy0, zx1, zy1 = rects[j]
+        if len(nearby) == 1:
+            # Sin vecinos: se borra la zona y se dibuja directo en la capa
+            layer[zy0:zy1, zx0:zx1] = 0
+            mask[zy0:zy1, zx0:zx1] = 0
+            draw(j, layer, mask, (0, 0))
+            self.redrawn += 1
+            return rects[j]
+        x0, y0 = rects[nearby, :2].min(axis=0)
+        x1, y1 = rects[nearby, 2:].max(axis=0)
+        sheet = np.zeros((y1 - y0, x1 - x0, 3), np.uint8)
+        sheet_mask = np.zeros((y1 - y0, x1 - x0), np.uint8)
+        for i in nearby:
+            draw(i, sheet, sheet_mask, (x0, y0))
+        layer[zy0:zy1, zx0:zx1] = sheet[zy0 - y0:zy1 - y0, zx0 - x0:zx1 - x0]
+        mask[zy0:zy1, zx0:zx1] = sheet_mask[zy0 - y0:zy1 - y0, zx0 - x0:zx1 - x0]
+        self.redrawn += 1
+        return rects[j]
+
+    # Redibujar los tiempos de los espacios `dirty` de una vez: como _redraw_zone, pero con
+    # una sola hoja del tamaño de la imagen para todos. Se limpian en ella las zonas de los
+    # espacios afectados (los sucios y sus vecinos), se dibujan en orden y se copian a la capa
+    # solo las zonas sucias. Dibujar encima de un texto ya dibujado lo engrosa (putText
+    # suaviza), por eso no se dibuja directo en la capa.
+    def _redraw_timers(self, dirty):
+        nearby = np.flatnonzero(self._timer_neighbors[dirty].any(axis=0))
+        for x0, y0, x1, y1 in self.timer_rects[nearby]:
+            self._sheet[y0:y1, x0:x1] = 0
+            self._sheet_mask[y0:y1, x0:x1] = 0
+        for i in nearby:
+            self._draw_timer(i, self._sheet, self._sheet_mask, (0, 0))
+        for x0, y0, x1, y1 in self.timer_rects[dirty]:
+            self._timers[y0:y1, x0:x1] = self._sheet[y0:y1, x0:x1]
+            self._timer_mask[y0:y1, x0:x1] = self._sheet_mask[y0:y1, x0:x1]
+        self.redrawn += len(dirty)
+        return list(self.timer_rects[dirty])
+
+    # Combinar las capas en una zona: tiempos encima de la capa fija, con la máscara binaria
+    def _compose(self, zone=None):
+        x0, y0, x1, y1 = zone if zone is not None else (0, 0, self.shape[1], self.shape[0])
+        overlay = self._overlay[y0:y1, x0:x1]
+        timer_mask = self._timer_mask[y0:y1, x0:x1]
+        overlay[:] = self._static[y0:y1, x0:x1]
+        cv2.copyTo(self._timers[y0:y1, x0:x1], cv2.compare(timer_mask, 127, cv2.CMP_GT), overlay)
+        mask = self._mask[y0:y1, x0:x1]
+        cv2.max(self._static_mask[y0:y1, x0:x1], timer_mask, mask)
+        cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY, mask)
+
+    # Redibujar las capas completas
+    def _redraw_all(self):
+        for layer in (self._static, self._static_mask, self._timers, self._timer_mask):
+            layer[:] = 0
+        for i in range(len(self.polygons)):
+            self._draw_static(i, self._static, self._static_mask, (0, 0))
+            self._draw_timer(i, self._timers, self._timer_mask, (0, 0))
+        self._compose()
+
+    # Actualizar las capas con la ocupación y las llegadas (timestamps, NaN si está libre).
+    # Devuelve la cantidad de zonas redibujadas.
+    def update(self, occupied, start_times, now):
+        occupied = np.asarray(occupied, bool)
+        start_times = np.asarray(start_times, np.float64)
+        has_start = ~np.isnan(start_times)
+        seconds = np.full(len(occupied), -1, np.int64)
+        seconds[has_start] = np.maximum(now - start_times[has_start], 0).astype(np.int64)
+
+        static_dirty = np.flatnonzero(occupied != self._occupied)
+        self._occupied = occupied.copy()
+
+        # Primera vez: todo de una pasada sobre la imagen completa
+        if not self._drawn:
+            self._seconds = seconds
+            self._redraw_all()
+            self._drawn = True
+            self.redrawn += len(self.polygons)
+            return len(self.polygons)
+
+        # Tiempos que cambiaron: primero los que aparecen o desaparecen y luego los más
+        # atrasados, hasta timer_budget; los demás quedan para los próximos fotogramas
+        timer_dirty = np.flatnonzero(seconds != self._seconds)
+        if len(timer_dirty) > self.timer_budget:
+            lag = np.where((seconds[timer_dirty] < 0) | (self._seconds[timer_dirty] < 0), np.iinfo(np.int64).max,
+                           np.abs(seconds[timer_dirty] - self._seconds[timer_dirty]))
+            timer_dirty = timer_dirty[np.argsort(-lag, kind='stable')[:self.timer_budget]]
+        self._seconds[timer_dirty] = seconds[timer_dirty]
+
+        zones = [self._redraw_zone(j, self.static_rects, self._static_neighbors, self._draw_static,
+                                   self._static, self._static_mask) for j in static_dirty]
+        if len(timer_dirty):
+            zones += self._redraw_timers(timer_dirty)
+        for zone in zones:
+            self._compose(zone)
+        return len(zones)
+
+    # Dibujar los espacios sobre el fotograma (en el lugar) y devolverlo: la capa reemplaza al
+    # fotograma donde la máscara está encendida (mezclada con `alpha` si es transparente)
+    def draw(self, img, occupied, start_times, now):
+        if img.shape[:2] != self.shape:
+            raise ValueError(f"El fotograma mide {img.shape[:2]} y la capa {self.shape}")
+        self.update(occupied, start_times, now)
+        x0, y0, x1, y1 = self.bounds
+        if x1 <= x0 or y1 <= y0:
+            return img
+        roi = img[y0:y1, x0:x1]
+        overlay = self._overlay[y0:y1, x0:x1]
+        if self.alpha < 1.0:
+            overlay = cv2.addWeighted(roi, 1 - self.alpha, overlay, self.alpha, 0)
+        cv2.copyTo(overlay, self._mask[y0:y1, x0:x1], roi)
+        return img
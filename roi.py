@@ -0,0 +1,23 @@
+import numpy as np
+from detector import empty_detections
+
+# Inferencia recortada: las cámaras ven mucha calle y cielo, así que YOLO solo se ejecuta
+# sobre el rectángulo que cubre los espacios configurados (o unos pocos mosaicos que los
+# cubren) y las detecciones se trasladan de vuelta a coordenadas del fotograma. Las regiones
+# salen de crop_regions (occupancy.py), que SpaceLayout guarda por juego de posiciones.
+
+
+# Ejecutar el detector solo sobre las regiones (en un lote) y devolver las detecciones (M, 6)
+# con las cajas en coordenadas del fotograma completo
+def detect_in_regions(detector, img, regions, classes=None, conf=0.25):
+    if not regions:
+        return empty_detections()
+    crops = [img[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+    detections = detector.detect(crops, classes, conf)
+
+    chunks = []
+    for (x1, y1, _, _), dets in zip(regions, detections):
+        dets = dets.copy()
+        dets[:, :4] += np.array([x1, y1, x1, y1], dets.dtype)
+        chunks.append(dets)
+    return np.concatenate(chunks)
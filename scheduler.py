@@ -0,0 +1,82 @@
+import time
+import cv2
+import numpy as np
+
+# Planificador de inferencia por movimiento: la ocupación de un estacionamiento cambia
+# en segundos, así que YOLO solo se ejecuta cuando alguna región de los espacios cambió
+# lo suficiente respecto al último fotograma analizado, o cuando pasó demasiado tiempo.
+
+
+class MotionGate:
+    def __init__(self, threshold=12.0, max_interval=5.0, scale=4):
+        self.threshold = threshold          # Diferencia media de gris (0-255) que dispara la inferencia
+        self.max_interval = max_interval    # Segundos máximos sin ejecutar YOLO
+        self.scale = scale                  # Factor de reducción para la diferencia de cuadros
+        self.frames = 0
+        self.inferences = 0
+        self.last_scores = None
+        self.reset()
+
+    # Olvidar el fotograma de referencia para forzar la siguiente inferencia
+    def reset(self):
+        self._reference = None
+        self._last_inference = None
+        self._label_map = None
+        self._labels = None
+        self._counts = None
+
+    # Fracción de fotogramas en los que no se ejecutó YOLO
+    @property
+    def skip_ratio(self):
+        if self.frames == 0:
+            return 0.0
+        return 1.0 - self.inferences / self.frames
+
+    # Convertir el fotograma a gris reducido
+    def _small_gray(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        height, width = gray.shape
+        size = (max(1, width // self.scale), max(1, height // self.scale))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+    # Preparar las etiquetas reducidas de los espacios (solo cuando cambia el mapa)
+    def _prepare_labels(self, label_map, small_shape):
+        if label_map is self._label_map:
+            return
+        height, width = small_shape
+        small = cv2.resize(label_map, (width, height), interpolation=cv2.INTER_NEAREST)
+        labels = small.reshape(-1).astype(np.int64)
+        self._label_map = label_map
+        self._n_spaces = int(labels.max()) + 1 if labels.size else 0
+        self._inside = labels >= 0
+        self._labels = labels[self._inside]
+        self._counts = np.maximum(np.bincount(self._labels, minlength=self._n_spaces), 1)
+
+    # Diferencia media absoluta dentro de cada espacio respecto al fotograma de referencia
+    def roi_scores(self, small):
+        diff = cv2.absdiff(small, self._reference).reshape(-1)[self._inside]
+        sums = np.bincount(self._labels, weights=diff, minlength=self._n_spaces)
+        return sums / self._counts
+
+    # Decidir si este fotograma debe pasar por YOLO; si es así queda como nueva referencia
+    def should_infer(self, img, label_map, now=None):
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+        small = self._small_gray(img)
+        self._prepare_labels(label_map, small.shape)
+
+        run = (self._reference is None or self._reference.shape != small.shape
+               or now - self._last_inference >= self.max_interval)
+        if not run:
+            self.last_scores = self.roi_scores(small)
+            run = bool(self.last_scores.size) and self.last_scores.max() > self.threshold
+
+        if run:
+            self.inferences += 1
+            self._reference = small
+            self._last_inference = now
+        return run
+
+    # Resumen legible de la tasa de salto
+    def report(self):
+        return f"Inferencias: {self.inferences}/{self.frames} fotogramas (saltados: {self.skip_ratio:.1%})"
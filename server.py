@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+import cv2
+from detector import load_detector, detections_of_classes
+from occupancy import box_centers
+from pipeline import LatestQueue
+from lots import ParkingLot
+from log_writer import ParkingLogWriter
+from status_channel import StatusWriter
+from sessions import SessionStore
+from tracker import IoUTracker
+from metrics import MetricsRegistry, MetricsServer
+
+# Servicio multi-cámara / multi-estacionamiento: un solo modelo YOLO compartido recibe en
+# cada llamada un lote con el último fotograma de cada cámara. Cada estacionamiento tiene
+# su propio archivo de posiciones y su propio estado de ocupación.
+#
+# Ejemplo de configuración (cameras.json):
+# {
+#     "model": "yolov8m.pt",
+#     "backend": "openvino",
+#     "conf": 0.25,
+#     "sessions": "parking_sessions.db",
+#     "metrics_port": 9108,
+#     "metrics_host": "127.0.0.1",
+#     "smoothing": {"alpha": 0.5, "enter_threshold": 0.25, "exit_threshold": 0.1, "enter_frames": 2, "exit_frames": 4},
+#     "cameras": [
+#         {"name": "lote_a", "source": 1, "positions": "CarParkPos.pkl", "classes": [2]},
+#         {"name": "lote_b", "source": "rtsp://camara-b/stream", "positions": "CarParkPos_b.pkl",
+#          "tracker": {"iou_threshold": 0.3, "max_age": 10}, "min_dwell": 10.0}
+#     ],
+#     "database": {"user": "root", "password": "mysql", "host": "localhost", "database": "parking_system"}
+# }
+
+
+# Una cámara con su hilo de captura y su estacionamiento asociado
+class Camera:
+    def __init__(self, config, base_dir, smoothing=None, sessions_filename=None):
+        self.name = config['name']
+        self.source = config['source']
+        self.classes = tuple(config.get('classes', (2,)))
+        positions = os.path.join(base_dir, config['positions'])
+        # Las sesiones abiertas de todas las cámaras comparten un archivo, separadas por nombre
+        self.sessions = None if sessions_filename is None else SessionStore(sessions_filename, self.name)
+        self.lot = ParkingLot(self.name, positions, config.get('smoothing', smoothing), self.sessions)
+        self.status = StatusWriter(os.path.join(base_dir, config.get('status', f'spaces_status_{self.name}.bin')))
+        # Seguimiento opcional: solo cuentan los autos que permanecen min_dwell segundos en un espacio
+        self.tracker = IoUTracker(**config['tracker']) if 'tracker' in config else None
+        self.min_dwell = config.get('min_dwell', 10.0)
+        self.frames = LatestQueue(1)
+        self.processed = 0
+        self._cap = None
+        self._thread = None
+
+    def start(self, stop_event):
+        self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            print(f"Error: No se pudo abrir la cámara '{self.name}' ({self.source}).")
+            return False
+        self._thread = threading.Thread(target=self._capture_loop, args=(stop_event,),
+                                        name=f"captura-{self.name}", daemon=True)
+        self._thread.start()
+        return True
+
+    def _capture_loop(self, stop_event):
+        while not stop_event.is_set():
+            success, img = self._cap.read()
+            if not success:
+                print(f"Error al capturar el fotograma de '{self.name}'.")
+                break
+            self.frames.put(img)
+        self.frames.close()
+
+    def stop(self):
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self._cap is not None:
+            self._cap.release()
+        self.status.close()
+        if self.sessions is not None:
+            self.sessions.close()
+
+    # Publicar el estado de este estacionamiento en su canal compartido (solo si cambió)
+    def publish_status(self):
+        self.status.publish(self.lot.occupied, self.lot.start_times)
+
+
+class ParkingServer:
+    def __init__(self, config_filename):
+        with open(config_filename) as f:
+            config = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(config_filename))
+
+        # Un solo modelo compartido para todas las cámaras
+        self.detector = load_detector(config.get('model', 'yolov8m.pt'), config.get('backend', 'torch'),
+                                      imgsz=config.get('imgsz', 640), max_det=config.get('max_det', 300))
+        self.conf = config.get('conf', 0.25)
+        sessions = os.path.join(base_dir, config['sessions']) if 'sessions' in config else None
+        self.cameras = [Camera(c, base_dir, config.get('smoothing'), sessions) for c in config['cameras']]
+        self._stop = threading.Event()
+
+        # Registro en la base de datos MySQL (opcional), en segundo plano y con diario local
+        self.log_writer = None
+        if 'database' in config:
+            import mysql.connector
+            journal = os.path.join(base_dir, config.get('journal', 'parking_log_journal.jsonl'))
+            self.log_writer = ParkingLogWriter(lambda: mysql.connector.connect(**config['database']), journal).start()
+
+        # Métricas de Prometheus por cámara (opcional), servidas en un hilo aparte
+        self.metrics = MetricsRegistry()
+        self.batch_latency = self.metrics.histogram('inference_seconds', "Latencia de cada llamada al modelo con el lote")
+        for camera in self.cameras:
+            labels = {'lot': camera.name}
+            camera.frames_counter = self.metrics.counter('frames_total', "Fotogramas procesados", labels)
+            self.metrics.counter('dropped_frames_total', "Fotogramas descartados por la cola de captura", labels,
+                                 fn=lambda camera=camera: camera.frames.dropped)
+            self.metrics.gauge('spaces_total', "Espacios configurados", labels, fn=lambda camera=camera: camera.lot.n_spaces)
+            self.metrics.gauge('spaces_occupied', "Espacios ocupados", labels,
+                               fn=lambda camera=camera: camera.lot.occupied_spaces)
+        if self.log_writer is not None:
+            self.metrics.gauge('log_queue_depth', "Salidas esperando a escribirse en parking_log",
+                               fn=lambda: self.log_writer.pending)
+            self.metrics.counter('log_rows_written_total', "Filas escritas en parking_log",
+                                 fn=lambda: self.log_writer.written)
+            self.metrics.counter('log_rows_dead_total', "Filas rechazadas por la base de datos y descartadas",
+                                 fn=lambda: self.log_writer.dead)
+        self.metrics_server = None
+        if config.get('metrics_port'):
+            self.metrics_server = MetricsServer(self.metrics, config.get('metrics_host', '127.0.0.1'),
+                                                config['metrics_port'])
+
+    # Registrar las salidas de un estacionamiento, con el mismo formato que main5.py. La sesión
+    # de cada salida se borra recién cuando su fila está a salvo (settle_sessions)
+    def log_departures(self, camera, departures):
+        if self.log_writer is None:
+            if camera.sessions is not None:
+                camera.sessions.settle((key, start) for _, start, _, key in departures)
+            return
+        for space_number, start, end, key in departures:
+            self.log_writer.log(space_number, datetime.fromtimestamp(start), datetime.fromtimestamp(end),
+                                token=(camera.name, key, start))
+
+    # Borrar las sesiones cuyas salidas ya se escribieron en parking_log o en el diario
+    def settle_sessions(self):
+        if self.log_writer is None:
+            return
+        settled = {}
+        for name, key, start in self.log_writer.take_durable():
+            settled.setdefault(name, []).append((key, start))
+        for camera in self.cameras:
+            if camera.sessions is not None and camera.name in settled:
+                camera.sessions.settle(settled[camera.name])
+
+    # Tomar el último fotograma disponible de cada cámara
+    def collect_batch(self, timeout=0.05):
+        batch = []
+        for camera in self.cameras:
+            img = camera.frames.get(timeout=0)
+            if img is not None:
+                batch.append((camera, img))
+        if not batch:
+            time.sleep(timeout)
+        return batch
+
+    # Procesar un lote de fotogramas con una sola llamada al modelo
+    def process_batch(self, batch):
+        # Las clases de todas las cámaras se piden al modelo; cada cámara filtra luego las suyas
+        classes = sorted({cls for camera, _ in batch for cls in camera.classes})
+        # Las cámaras con seguidor necesitan las detecciones de baja confianza (su segunda
+        # etapa); el seguidor aplica su propio umbral alto y las demás cámaras el de self.conf
+        conf = min([self.conf] + [camera.tracker.low_conf for camera, _ in batch if camera.tracker is not None])
+        start = time.perf_counter()
+        detections = self.detector.detect([img for _, img in batch], classes=classes, conf=conf)
+        self.batch_latency.observe(time.perf_counter() - start)
+        for (camera, img), dets in zip(batch, detections):
+            camera.lot.refresh()
+            dets = detections_of_classes(dets, camera.classes)
+            if camera.tracker is not None:
+                now = time.time()
+                camera.tracker.update(dets, now)
+                dets = camera.tracker.dwelling(camera.lot.layout.label_map(img.shape), camera.min_dwell, now)
+            elif conf < self.conf:
+                dets = dets[dets[:, 4] >= self.conf]
+            confidence = camera.lot.layout.occupancy_confidence(box_centers(dets[:, :4]), dets[:, 4], img.shape)
+            occupied = camera.lot.observe(confidence)
+            self.log_departures(camera, camera.lot.update(occupied))
+            camera.publish_status()
+            camera.processed += 1
+            camera.frames_counter.inc()
+        self.settle_sessions()
+
+    # Fotogramas por segundo procesados por cámara desde el último reporte
+    def report(self, elapsed, previous):
+        lines = []
+        for camera in self.cameras:
+            fps = (camera.processed - previous.get(camera.name, 0)) / max(elapsed, 1e-9)
+            lines.append(f"{camera.name}: {fps:.1f} fps, libres {camera.lot.free_spaces}/{camera.lot.n_spaces}")
+        return ' | '.join(lines)
+
+    def run(self, report_every=10.0):
+        active = [camera for camera in self.cameras if camera.start(self._stop)]
+        if not active:
+            return
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+
+        last_report = time.monotonic()
+        previous = {}
+        try:
+            while not self._stop.is_set():
+                if all(camera.frames.closed and len(camera.frames) == 0 for camera in active):
+                    break
+                batch = self.collect_batch()
+                if batch:
+                    self.process_batch(batch)
+
+                now = time.monotonic()
+                if now - last_report >= report_every:
+                    print(self.report(now - last_report, previous))
+                    previous = {camera.name: camera.processed for camera in self.cameras}
+                    last_report = now
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        if self.log_writer is not None:
+            self.log_writer.stop()
+            self.settle_sessions()
+        for camera in self.cameras:
+            camera.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de ocupación para varias cámaras")
+    parser.add_argument('config', help="Archivo JSON con la lista de cámaras")
+    args = parser.parse_args()
+
+    ParkingServer(args.config).run()
@@ -0,0 +1,104 @@
+import json
+import sqlite3
+import threading
+import time
+
+# Sesiones abiertas (autos estacionados y su hora de llegada) guardadas en un SQLite local
+# en modo WAL. Solo se escribe cuando un espacio cambia de estado, en una transacción por
+# fotograma, así que el costo por fotograma es nulo mientras nada cambia. Al reiniciar el
+# detector las sesiones se recuperan comparando los espacios por sus vértices, de modo que
+# los autos que ya estaban no pierden su hora de llegada.
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS open_sessions (
+                lot TEXT NOT NULL,
+                space_key TEXT NOT NULL,
+                start REAL NOT NULL,
+                PRIMARY KEY (lot, space_key)
+            )'''
+
+
+# Clave estable de un espacio a partir de sus vértices
+def space_key(pos):
+    return json.dumps([[int(x), int(y)] for x, y in pos], separators=(',', ':'))
+
+
+class SessionStore:
+    def __init__(self, filename, lot=''):
+        self.filename = filename
+        self.lot = lot  # Permite compartir el archivo entre varios estacionamientos
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Con WAL, NORMAL sobrevive a la caída del proceso sin sincronizar el disco en cada cambio
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+
+    # Sesiones abiertas guardadas para este estacionamiento: {clave del espacio: llegada}
+    def load(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT space_key, start FROM open_sessions WHERE lot = ?",
+                                      (self.lot,)).fetchall()
+        return dict(rows)
+
+    # Recuperar las sesiones de los espacios actuales (lista de posiciones). Devuelve
+    # {índice del espacio: llegada}; las sesiones de espacios que ya no existen se descartan.
+    def restore(self, pos_list):
+        saved = self.load()
+        keys = [space_key(pos) for pos in pos_list]
+        restored = {i: saved[key] for i, key in enumerate(keys) if key in saved}
+        stale = set(saved) - set(keys)
+        if stale:
+            self.record(departures=stale)
+        return restored
+
+    # Guardar las llegadas {clave: llegada} y borrar las salidas (claves) en una sola transacción
+    def record(self, arrivals=None, departures=None):
+        if not arrivals and not departures:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if departures:
+                    self._conn.executemany("DELETE FROM open_sessions WHERE lot = ? AND space_key = ?",
+                                           [(self.lot, key) for key in departures])
+                if arrivals:
+                    self._conn.executemany("INSERT OR REPLACE INTO open_sessions (lot, space_key, start) VALUES (?, ?, ?)",
+                                           [(self.lot, key, float(start)) for key, start in arrivals.items()])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # Borrar las sesiones cuya salida ya quedó asentada en parking_log: pares (clave, llegada).
+    # Si el espacio se volvió a ocupar mientras tanto, su sesión nueva (otra llegada) se conserva.
+    def settle(self, sessions):
+        sessions = [(self.lot, key, float(start)) for key, start in sessions]
+        if not sessions:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM open_sessions WHERE lot = ? AND space_key = ? AND start = ?",
+                                   sessions)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Medir la recuperación de `n_spaces` sesiones abiertas
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    n_spaces = 5000
+    pos_list = [[(i, 0), (i, 10), (i + 10, 10), (i + 10, 0)] for i in range(n_spaces)]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, 'sessions.db'))
+        store.record(arrivals={space_key(pos): time.time() for pos in pos_list})
+        store.close()
+
+        start = time.perf_counter()
+        store = SessionStore(os.path.join(tmp, 'sessions.db'))
+        restored = store.restore(pos_list)
+        elapsed = time.perf_counter() - start
+        store.close()
+    print(f"{len(restored)} sesiones recuperadas en {elapsed * 1000:.1f} ms")
@@ -0,0 +1,125 @@
+import argparse
+import csv
+import numpy as np
+
+# Filtro temporal de ocupación con histéresis: una detección perdida no libera el espacio
+# ni una detección suelta lo ocupa. Cada espacio lleva un promedio móvil exponencial (EMA)
+# de la confianza de detección y una máquina de estados:
+#   libre -> ocupado  cuando el EMA supera enter_threshold durante enter_frames actualizaciones
+#   ocupado -> libre  cuando el EMA baja de exit_threshold durante exit_frames actualizaciones
+# Entre los dos umbrales el estado no cambia. Todo el estado vive en arreglos por espacio y
+# se actualiza de forma vectorizada en cada inferencia.
+#
+# enter_threshold no debe superar el umbral de confianza del detector (conf=0.25 por
+# defecto): un auto detectado con una confianza entre los dos nunca ocuparía el espacio.
+
+
+class OccupancyFilter:
+    def __init__(self, n_spaces, alpha=0.5, enter_threshold=0.25, exit_threshold=0.1,
+                 enter_frames=2, exit_frames=4):
+        if exit_threshold > enter_threshold:
+            raise ValueError("exit_threshold no puede ser mayor que enter_threshold")
+        self.alpha = alpha                      # Peso de la observación nueva en el EMA (1 = sin suavizado)
+        self.enter_threshold = enter_threshold
+        self.exit_threshold = exit_threshold
+        self.enter_frames = enter_frames        # Actualizaciones seguidas sobre el umbral para ocupar
+        self.exit_frames = exit_frames          # Actualizaciones seguidas bajo el umbral para liberar
+        self.updates = 0
+        self.ema = np.zeros(n_spaces)
+        self.occupied = np.zeros(n_spaces, bool)
+        self._streak = np.zeros(n_spaces, np.int32)  # Actualizaciones seguidas pidiendo el cambio
+        self._primed = np.zeros(n_spaces, bool)      # El EMA ya recibió su primera observación
+
+    @property
+    def n_spaces(self):
+        return len(self.occupied)
+
+    # Reordenar el estado tras recargar las posiciones: old_index[i] es el índice anterior del
+    # espacio i, o -1 si es un espacio nuevo (empieza libre)
+    def reindex(self, old_index):
+        old_index = np.asarray(old_index, np.int64)
+        known = old_index >= 0
+        ema = np.zeros(len(old_index))
+        occupied = np.zeros(len(old_index), bool)
+        streak = np.zeros(len(old_index), np.int32)
+        primed = np.zeros(len(old_index), bool)
+        ema[known] = self.ema[old_index[known]]
+        occupied[known] = self.occupied[old_index[known]]
+        streak[known] = self._streak[old_index[known]]
+        primed[known] = self._primed[old_index[known]]
+        self.ema, self.occupied, self._streak, self._primed = ema, occupied, streak, primed
+
+    # Marcar espacios como ocupados y confirmados (por ejemplo, sesiones recuperadas al reiniciar)
+    def set_occupied(self, indices):
+        indices = np.asarray(indices, np.int64)
+        self.occupied[indices] = True
+        self.ema[indices] = 1.0
+        self._streak[indices] = 0
+        self._primed[indices] = True
+
+    # Incorporar la confianza (o la ocupación 0/1) observada en cada espacio; devuelve el
+    # vector de ocupación filtrado
+    def update(self, confidence):
+        confidence = np.asarray(confidence, np.float64)
+        if len(confidence) != self.n_spaces:
+            raise ValueError(f"Se esperaban {self.n_spaces} espacios y llegaron {len(confidence)}")
+        # La primera observación de cada espacio inicializa su EMA
+        self.ema = np.where(self._primed, self.ema + self.alpha * (confidence - self.ema), confidence)
+        self._primed[:] = True
+        self.updates += 1
+
+        # Cada espacio cuenta las actualizaciones seguidas en las que pide cambiar de estado
+        wants_change = np.where(self.occupied, self.ema < self.exit_threshold, self.ema >= self.enter_threshold)
+        self._streak = np.where(wants_change, self._streak + 1, 0)
+        needed = np.where(self.occupied, self.exit_frames, self.enter_frames)
+        flip = self._streak >= needed
+        self.occupied ^= flip
+        self._streak[flip] = 0
+        return self.occupied.copy()
+
+
+# Cantidad de cambios de estado (llegadas más salidas) en una secuencia (T, N) de ocupación
+def count_transitions(sequence):
+    sequence = np.asarray(sequence, bool)
+    if len(sequence) < 2:
+        return 0
+    return int((sequence[1:] != sequence[:-1]).sum())
+
+
+# Pasar una secuencia grabada (T, N) de confianzas u ocupaciones por el filtro; devuelve la
+# secuencia (T, N) filtrada
+def replay(sequence, **kwargs):
+    sequence = np.asarray(sequence, np.float64)
+    space_filter = OccupancyFilter(sequence.shape[1], **kwargs)
+    return np.array([space_filter.update(row) for row in sequence]).reshape(sequence.shape)
+
+
+# Leer la serie de ocupación (T, N) de un CSV escrito por batch_analysis.py
+def load_sequence(filename):
+    with open(filename, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = [i for i, name in enumerate(header) if name.startswith('espacio_')]
+        rows = [[float(row[i]) for i in columns] for row in reader]
+    return np.array(rows, np.float64).reshape(-1, len(columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproducir una serie de ocupación grabada con el filtro de histéresis")
+    parser.add_argument('csv', help="CSV generado por batch_analysis.py")
+    parser.add_argument('--alpha', type=float, default=0.5)
+    parser.add_argument('--enter-threshold', type=float, default=0.25)
+    parser.add_argument('--exit-threshold', type=float, default=0.1)
+    parser.add_argument('--enter-frames', type=int, default=2)
+    parser.add_argument('--exit-frames', type=int, default=4)
+    args = parser.parse_args()
+
+    raw = load_sequence(args.csv)
+    smoothed = replay(raw, alpha=args.alpha, enter_threshold=args.enter_threshold,
+                      exit_threshold=args.exit_threshold, enter_frames=args.enter_frames,
+                      exit_frames=args.exit_frames)
+    raw_changes = count_transitions(raw > 0)
+    smoothed_changes = count_transitions(smoothed)
+    print(f"{len(raw)} fotogramas, {raw.shape[1]} espacios")
+    print(f"Cambios de estado sin filtro: {raw_changes}, con filtro: {smoothed_changes}")
+    print(f"Sesiones cortas evitadas: {max(0, raw_changes - smoothed_changes) // 2}")
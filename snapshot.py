@@ -0,0 +1,101 @@
+import threading
+import time
+import cv2
+
+# Vista del detector sin ventana: reemplaza a cv2.imshow en un servidor con una imagen JPEG
+# (GET /snapshot.jpg) o un stream MJPEG de pocos cuadros por segundo (GET /stream.mjpg),
+# servidos desde el mismo hilo HTTP que las métricas. El ciclo de fotogramas solo dibuja y
+# codifica cuando alguien miró en los últimos `idle_after` segundos y pasó `interval` desde
+# el último JPEG, así que sin clientes no cuesta nada. main5.py solo agrega estas rutas con
+# --snapshot.
+#
+#   curl -o vista.jpg http://localhost:9108/snapshot.jpg
+#   (en un navegador) http://localhost:9108/stream.mjpg
+
+BOUNDARY = 'frame'
+
+
+class FrameSnapshot:
+    def __init__(self, interval=1.0, quality=80, idle_after=10.0):
+        self.interval = interval        # Segundos mínimos entre dos JPEG
+        self.quality = quality
+        self.idle_after = idle_after    # Sin pedidos en este tiempo se deja de codificar
+        self.encoded = 0                # JPEG codificados en total
+        self._jpeg = None
+        self._sequence = 0
+        self._last_encode = 0.0
+        self._last_request = -float('inf')
+        self._closed = False
+        self._condition = threading.Condition()
+
+    # ¿Hay que entregar un fotograma nuevo? (se consulta en cada fotograma del ciclo)
+    def due(self):
+        now = time.monotonic()
+        return (not self._closed and now - self._last_request < self.idle_after
+                and now - self._last_encode >= self.interval)
+
+    # Codificar el fotograma (ya dibujado) y despertar a los clientes que esperan
+    def offer(self, img):
+        ok, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        with self._condition:
+            self._jpeg = buffer.tobytes()
+            self._sequence += 1
+            self._last_encode = time.monotonic()
+            self.encoded += 1
+            self._condition.notify_all()
+
+    # Esperar un JPEG posterior a `after` (número de secuencia); devuelve (secuencia, jpeg),
+    # o el último disponible si no llega uno nuevo en `timeout` segundos
+    def wait(self, after, timeout):
+        with self._condition:
+            self._last_request = time.monotonic()
+            self._condition.wait_for(lambda: self._sequence > after or self._closed, timeout)
+            return self._sequence, self._jpeg
+
+    # Despertar y cortar los streams abiertos
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    # Ruta de MetricsServer: un JPEG reciente
+    def serve_snapshot(self, handler):
+        _, jpeg = self.wait(self._sequence, self.interval + 2.0)
+        if jpeg is None:
+            handler.send_error(503, "Todavía no hay fotogramas")
+            return
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'image/jpeg')
+        handler.send_header('Content-Length', str(len(jpeg)))
+        handler.send_header('Cache-Control', 'no-store')
+        handler.end_headers()
+        handler.wfile.write(jpeg)
+
+    # Ruta de MetricsServer: stream MJPEG hasta que el cliente se desconecte
+    def serve_stream(self, handler):
+        handler.send_response(200)
+        handler.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        handler.send_header('Cache-Control', 'no-store')
+        handler.end_headers()
+        sequence = 0
+        try:
+            while not self._closed:
+                new_sequence, jpeg = self.wait(sequence, self.interval + 2.0)
+                if jpeg is None or new_sequence == sequence:
+                    continue
+                sequence = new_sequence
+                handler.wfile.write(f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n'
+                                    f'Content-Length: {len(jpeg)}\r\n\r\n'.encode('ascii'))
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b'\r\n')
+                handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # El cliente cerró la conexión
+
+    # Publicar /snapshot.jpg y /stream.mjpg en un MetricsServer
+    def add_routes(self, server):
+        server.add_route('/snapshot.jpg', self.serve_snapshot)
+        server.add_route('/stream.mjpg', self.serve_stream)
+        return self
@@ -0,0 +1,137 @@
+import numpy as np
+
+# Índice espacial para estacionamientos muy grandes (panorámicas de miles de espacios):
+# una grilla uniforme sobre los rectángulos envolventes de los polígonos, construida una vez
+# por juego de posiciones. Cada celda guarda los espacios cuyo rectángulo la toca, así que
+# cada detección solo se prueba contra los pocos espacios de sus celdas en lugar de contra
+# todos. Las celdas se guardan en formato CSR (inicio de cada celda en un solo arreglo de
+# espacios), sin listas de Python. Las confianzas por espacio que usan la grilla están en
+# occupancy.py (grid_confidence, grid_overlap_confidence).
+#
+#   python spatial_index.py --sizes 100 500 2000 10000
+
+
+# Expandir rangos de celdas [c0, c1] x [r0, r1] (inclusive) de cada elemento en pares
+# (elemento, celda) con celda = fila * columnas + columna
+def _expand_cells(c0, c1, r0, r1, n_cols):
+    widths = c1 - c0 + 1
+    counts = widths * (r1 - r0 + 1)
+    owners = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows = r0[owners] + offsets // widths[owners]
+    cols = c0[owners] + offsets % widths[owners]
+    return owners, rows * n_cols + cols
+
+
+class SpatialGrid:
+    def __init__(self, polygons, cell_size=None):
+        polygons = np.asarray(polygons, np.float64)
+        self.n_spaces = len(polygons)
+        if self.n_spaces == 0:
+            polygons = np.zeros((0, 1, 2), np.float64)
+        self.lo = polygons.min(axis=1) if self.n_spaces else np.zeros((0, 2))
+        self.hi = polygons.max(axis=1) if self.n_spaces else np.zeros((0, 2))
+
+        # Por defecto, celdas del tamaño de un espacio típico: cada espacio toca unas 4 celdas
+        if cell_size is None:
+            cell_size = float(np.median(self.hi - self.lo)) if self.n_spaces else 1.0
+        self.cell_size = max(float(cell_size), 1.0)
+        self.origin = self.lo.min(axis=0) if self.n_spaces else np.zeros(2)
+        extent = (self.hi.max(axis=0) - self.origin) if self.n_spaces else np.zeros(2)
+        self.n_cols, self.n_rows = (extent // self.cell_size).astype(np.int64) + 1
+
+        c0, r0 = self._cell_coords(self.lo).T
+        c1, r1 = self._cell_coords(self.hi).T
+        spaces, cells = _expand_cells(c0, c1, r0, r1, self.n_cols)
+        order = np.argsort(cells, kind='stable')
+        self.items = spaces[order]
+        self.starts = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=self.n_cols * self.n_rows))])
+
+    # Columna y fila de cada punto, recortadas a la grilla
+    def _cell_coords(self, points):
+        cells = np.floor((np.asarray(points, np.float64).reshape(-1, 2) - self.origin) / self.cell_size)
+        return np.clip(cells, 0, [self.n_cols - 1, self.n_rows - 1]).astype(np.int64)
+
+    # Pares (índice de la consulta, espacio) para las celdas de cada consulta
+    def _gather(self, owners, cells):
+        counts = self.starts[cells + 1] - self.starts[cells]
+        queries = np.repeat(owners, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return queries, self.items[np.repeat(self.starts[cells], counts) + offsets]
+
+    # Candidatos de cada punto: pares (punto, espacio) cuyo rectángulo contiene al punto
+    def point_candidates(self, points):
+        points = np.asarray(points, np.float64).reshape(-1, 2)
+        if self.n_spaces == 0 or len(points) == 0:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        cols, rows = self._cell_coords(points).T
+        queries, spaces = self._gather(np.arange(len(points)), rows * self.n_cols + cols)
+        p = points[queries]
+        inside = ((p >= self.lo[spaces]) & (p <= self.hi[spaces])).all(axis=1)
+        return queries[inside], spaces[inside]
+
+    # Candidatos de cada caja x1, y1, x2, y2: pares (caja, espacio) cuyos rectángulos se tocan,
+    # sin repetir aunque compartan varias celdas
+    def box_candidates(self, boxes):
+        boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+        if self.n_spaces == 0 or len(boxes) == 0:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        c0, r0 = self._cell_coords(boxes[:, :2]).T
+        c1, r1 = self._cell_coords(boxes[:, 2:]).T
+        owners, cells = _expand_cells(c0, c1, r0, r1, self.n_cols)
+        queries, spaces = self._gather(owners, cells)
+        pairs = np.unique(queries * self.n_spaces + spaces)
+        queries, spaces = pairs // self.n_spaces, pairs % self.n_spaces
+        touching = ((boxes[queries, :2] <= self.hi[spaces] + 1) & (boxes[queries, 2:] >= self.lo[spaces] - 1)).all(axis=1)
+        return queries[touching], spaces[touching]
+
+
+# Comparar la grilla contra la fuerza bruta (todos los espacios contra todas las detecciones)
+if __name__ == "__main__":
+    import argparse
+    import time
+    from bench_occupancy import synthetic_lot, synthetic_boxes, time_per_frame
+    from occupancy import (build_polygons, points_in_polygons, build_overlap_tables, overlap_confidence,
+                           box_centers, grid_confidence, grid_overlap_confidence)
+
+    parser = argparse.ArgumentParser(description="Índice espacial de polígonos contra fuerza bruta")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[100, 500, 2000, 10000])
+    parser.add_argument('--boxes-per-space', type=float, default=0.5)
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'espacios':>9}{'autos':>7}{'construir':>11}{'centros bruta':>15}{'centros grilla':>16}"
+          f"{'superp. bruta':>15}{'superp. grilla':>16}")
+    for n_spaces in args.sizes:
+        pos_list = synthetic_lot(n_spaces)
+        polygons = build_polygons(pos_list)
+        boxes = synthetic_boxes(pos_list, max(1, int(n_spaces * args.boxes_per_space)))
+        centers = box_centers(boxes)
+        conf = np.random.default_rng(0).uniform(0.3, 0.95, len(boxes))
+
+        start = time.perf_counter()
+        grid = SpatialGrid(polygons)
+        build_ms = (time.perf_counter() - start) * 1000
+        tables = build_overlap_tables(polygons)
+
+        # Fuerza bruta de centros, por bloques para no llenar la memoria con (N, K, M)
+        def brute_centers():
+            result = np.zeros(n_spaces, np.float64)
+            for chunk in range(0, len(centers), 64):
+                inside = points_in_polygons(centers[chunk:chunk + 64], polygons)
+                scores = np.where(inside, conf[None, chunk:chunk + 64], 0.0)
+                result = np.maximum(result, scores.max(axis=1))
+            return result
+
+        assert np.array_equal(brute_centers(), grid_confidence(grid, polygons, centers, conf))
+        assert np.array_equal(overlap_confidence(boxes, conf, tables), grid_overlap_confidence(grid, boxes, conf, tables))
+
+        repeats = args.repeats if n_spaces <= 2000 else max(1, args.repeats // 5)
+        times = [time_per_frame(fn, repeats) for fn in (
+            brute_centers,
+            lambda: grid_confidence(grid, polygons, centers, conf),
+            lambda: overlap_confidence(boxes, conf, tables),
+            lambda: grid_overlap_confidence(grid, boxes, conf, tables))]
+        print(f"{n_spaces:>9}{len(boxes):>7}{build_ms:>11.2f}"
+              + ''.join(f"{t:>{width}.3f}" for t, width in zip(times, (15, 16, 15, 16))))
+    print("(ms por fotograma; construir = una vez por juego de posiciones)")
@@ -0,0 +1,277 @@
+import math
+import mmap
+import os
+import struct
+import time
+import numpy as np
+
+# Canal de estado compartido en memoria (archivo mapeado con mmap) con un formato binario
+# fijo y versionado. El detector escribe solo cuando algo cambia y cualquier número de
+# lectores obtiene instantáneas consistentes sin abrir ni deserializar archivos: un contador
+# de secuencia impar indica que hay una escritura en curso (seqlock) y el lector reintenta.
+#
+# Cada espacio guarda además la secuencia en la que cambió por última vez, así un lector
+# puede pedir solo los espacios que cambiaron desde su última lectura (actualización delta).
+#
+# Formato versión 2 (little-endian), columnas de `capacity` elementos:
+#   cabecera    HEADER_FORMAT (64 bytes): magia, versión, capacidad, secuencia, espacios,
+#               libres, ocupados, hora de actualización
+#   ocupación   bits (np.packbits), alineado a 8 bytes
+#   llegadas    float64, timestamp de llegada o NaN si el espacio está libre
+#   cambios     uint64, secuencia del último cambio de cada espacio
+#   confianza   uint8, confianza de la detección (0-255), alineado a 8 bytes
+
+MAGIC = b'PKST'
+VERSION = 2
+HEADER_FORMAT = '<4sIIxxxxQIIId'
+HEADER_SIZE = 64
+SEQ_OFFSET = 16  # Posición del contador de secuencia dentro de la cabecera
+TOTALS_OFFSET = 24  # Posición de espacios, libres, ocupados y hora de actualización
+
+# Un cambio de confianza menor a esto (en la escala 0-255) no se publica
+CONFIDENCE_STEP = 13
+
+
+def _align8(size):
+    return int(math.ceil(size / 8)) * 8
+
+
+# Desplazamientos de cada columna y tamaño total del archivo para una capacidad dada
+def _layout(capacity):
+    bits_offset = HEADER_SIZE
+    starts_offset = bits_offset + _align8(math.ceil(capacity / 8))
+    changed_offset = starts_offset + capacity * 8
+    confidence_offset = changed_offset + capacity * 8
+    size = confidence_offset + _align8(capacity)
+    return {'bits': bits_offset, 'starts': starts_offset, 'changed': changed_offset,
+            'confidence': confidence_offset, 'size': size}
+
+
+# Vistas NumPy de cada columna sobre el mapa de memoria
+def _columns(buffer, capacity, layout):
+    return {
+        'bits': np.frombuffer(buffer, np.uint8, layout['starts'] - layout['bits'], layout['bits']),
+        'starts': np.frombuffer(buffer, np.float64, capacity, layout['starts']),
+        'changed': np.frombuffer(buffer, np.uint64, capacity, layout['changed']),
+        'confidence': np.frombuffer(buffer, np.uint8, capacity, layout['confidence']),
+    }
+
+
+class StatusWriter:
+    def __init__(self, filename, capacity=4096):
+        self.filename = filename
+        existing = self._existing_capacity(filename)
+        if existing is None or existing < capacity:
+            # Archivo nuevo o más chico: se arma aparte y se reemplaza con un rename, nunca se
+            # trunca debajo de un lector que lo tiene mapeado (eso termina en SIGBUS)
+            self._create(filename, capacity)
+        else:
+            capacity = existing  # Se reutiliza tal cual; los lectores siguen con el mismo mapa
+        self.capacity = capacity
+        self._layout = _layout(capacity)
+        size = self._layout['size']
+        self._file = open(filename, 'r+b')
+        self._mm = mmap.mmap(self._file.fileno(), size)
+
+        self._seq = np.frombuffer(self._mm, np.uint64, 1, SEQ_OFFSET)
+        self._columns = _columns(self._mm, capacity, self._layout)
+        self._last = None
+        self.writes = 0
+
+        # Vaciar el canal como una escritura más; si un escritor anterior murió a mitad de
+        # escritura la secuencia ya es impar y se cierra con esta
+        seq = int(self._seq[0])
+        if seq % 2 == 0:
+            self._seq[0] = seq + 1
+        self._write_header(seq + 2 - seq % 2, 0, 0, 0)
+
+    # Capacidad de un canal existente con el formato actual y el tamaño que le corresponde
+    @staticmethod
+    def _existing_capacity(filename):
+        try:
+            with open(filename, 'rb') as f:
+                header = f.read(12)
+                size = os.fstat(f.fileno()).st_size
+        except FileNotFoundError:
+            return None
+        if len(header) != 12:
+            return None
+        magic, version, capacity = struct.unpack('<4sII', header)
+        if magic != MAGIC or version != VERSION or size != _layout(capacity)['size']:
+            return None
+        return capacity
+
+    @classmethod
+    def _create(cls, filename, capacity):
+        temp = f'{filename}.{os.getpid()}.tmp'
+        with open(temp, 'wb') as f:
+            f.write(b'\0' * _layout(capacity)['size'])
+            f.flush()
+            os.fsync(f.fileno())
+        cls._retire(filename)
+        os.replace(temp, filename)
+
+    # Marcar el archivo que se va a reemplazar con versión 0, sin cambiar su tamaño, para que
+    # los lectores que lo tienen mapeado se den cuenta y vuelvan a abrir el archivo nuevo
+    @staticmethod
+    def _retire(filename):
+        try:
+            with open(filename, 'r+b') as f:
+                if len(f.read(8)) == 8:
+                    f.seek(4)
+                    f.write(struct.pack('<I', 0))
+        except FileNotFoundError:
+            pass
+
+    # Escribir la cabecera y recién al final la secuencia: un lector que ve la secuencia par
+    # nueva ya encuentra los totales que le corresponden
+    def _write_header(self, seq, n_spaces, free, occupied):
+        struct.pack_into('<4sII', self._mm, 0, MAGIC, VERSION, self.capacity)
+        struct.pack_into('<IIId', self._mm, TOTALS_OFFSET, n_spaces, free, occupied, time.time())
+        self._seq[0] = seq
+
+    # Publicar la ocupación, las llegadas y la confianza de cada espacio. Solo se escribe si
+    # algún espacio cambió; los espacios modificados quedan marcados con la nueva secuencia.
+    def publish(self, occupied, start_times, confidence=None):
+        occupied = np.asarray(occupied, bool)
+        start_times = np.asarray(start_times, np.float64)
+        n_spaces = len(occupied)
+        if n_spaces > self.capacity:
+            raise ValueError(f"Hay {n_spaces} espacios, pero el canal de estado admite {self.capacity}")
+        if confidence is None:
+            confidence = occupied.astype(np.float64)
+        quantized = np.clip(np.round(np.asarray(confidence, np.float64) * 255), 0, 255).astype(np.uint8)
+
+        if self._last is None or len(self._last[0]) != n_spaces:
+            changed = np.ones(n_spaces, bool)
+            published = quantized.astype(np.int16)
+        else:
+            last_occupied, last_starts, last_confidence = self._last
+            changed = ((occupied != last_occupied)
+                       | ~((start_times == last_starts) | (np.isnan(start_times) & np.isnan(last_starts)))
+                       | (np.abs(quantized.astype(np.int16) - last_confidence) >= CONFIDENCE_STEP))
+            if not changed.any():
+                return False
+            # La confianza publicada solo se actualiza en los espacios que cambiaron
+            published = last_confidence.copy()
+            published[changed] = quantized[changed]
+
+        cols = self._columns
+        seq = int(self._seq[0])
+        new_seq = seq + 2
+        self._seq[0] = seq + 1  # Impar: escritura en curso
+
+        bits = np.packbits(occupied)
+        cols['bits'][:len(bits)] = bits
+        cols['bits'][len(bits):] = 0
+        cols['starts'][:n_spaces] = start_times
+        cols['starts'][n_spaces:] = np.nan
+        cols['confidence'][:n_spaces][changed] = quantized[changed]
+        cols['confidence'][n_spaces:] = 0
+        cols['changed'][:n_spaces][changed] = new_seq
+
+        n_occupied = int(occupied.sum())
+        self._write_header(new_seq, n_spaces, n_spaces - n_occupied, n_occupied)  # Par: listo
+
+        self._last = (occupied.copy(), start_times.copy(), published)
+        self.writes += 1
+        return True
+
+    def close(self):
+        self._seq = self._columns = None
+        self._mm.close()
+        self._file.close()
+
+
+class StatusReader:
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, capacity = struct.unpack_from('<4sII', self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"'{filename}' no es un canal de estado válido (versión {VERSION})")
+        self.capacity = capacity
+        self._layout = _layout(capacity)
+        self._columns = _columns(self._mm, capacity, self._layout)
+        self.last_seq = None
+        self._last_n_spaces = None
+
+    # Si el escritor reemplazó el archivo (más capacidad), pasar al nuevo y releer todo; mientras
+    # el nuevo no esté en su lugar se sigue leyendo el anterior
+    def _reopen_if_retired(self):
+        if struct.unpack_from('<I', self._mm, 4)[0] == VERSION:
+            return
+        try:
+            reader = StatusReader(self.filename)
+        except (OSError, ValueError):
+            return
+        self.close()
+        self._file, self._mm = reader._file, reader._mm
+        self.capacity, self._layout, self._columns = reader.capacity, reader._layout, reader._columns
+        self.last_seq = None
+        self._last_n_spaces = None
+
+    def _seq(self):
+        return struct.unpack_from('<Q', self._mm, SEQ_OFFSET)[0]
+
+    # Leer de forma consistente todos los espacios, o solo los que cambiaron después de la
+    # secuencia `since`. Devuelve un dict con la secuencia, los totales y las columnas
+    def _read(self, since=None, retries=1000):
+        self._reopen_if_retired()
+        cols = self._columns
+        for _ in range(retries):
+            seq = self._seq()
+            if seq % 2:
+                continue  # Escritura en curso
+            _, _, _, _, n_spaces, free, occupied, updated_at = struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+            full = since is None or n_spaces != self._last_n_spaces
+            if full:
+                indices = np.arange(n_spaces)
+            else:
+                indices = np.flatnonzero(cols['changed'][:n_spaces] > since)
+            bits = np.unpackbits(cols['bits'], count=n_spaces)[indices].astype(bool)
+            starts = cols['starts'][indices]
+            confidence = cols['confidence'][indices] / 255.0
+            if self._seq() != seq:
+                continue  # El escritor cambió los datos mientras se copiaban
+            self.last_seq = seq
+            self._last_n_spaces = n_spaces
+            return {
+                'seq': seq,
+                'n_spaces': n_spaces,
+                'free': free,
+                'occupied': occupied,
+                'updated_at': updated_at,
+                'full': full,
+                'indices': indices,
+                'occupancy': bits,
+                'start_times': starts,
+                'confidence': confidence,
+            }
+        return None
+
+    # Instantánea consistente de todos los espacios
+    def snapshot(self):
+        return self._read()
+
+    # Instantánea completa solo si hubo cambios desde la última lectura; None si no
+    def poll(self):
+        self._reopen_if_retired()
+        if self._seq() == self.last_seq:
+            return None
+        return self.snapshot()
+
+    # Solo los espacios que cambiaron desde la última lectura ('full' es True si se
+    # devolvieron todos, por ejemplo en la primera lectura o al cambiar las posiciones)
+    def poll_delta(self):
+        self._reopen_if_retired()
+        if self._seq() == self.last_seq:
+            return None
+        return self._read(since=self.last_seq)
+
+    def close(self):
+        self._columns = None
+        self._mm.close()
+        self._file.close()
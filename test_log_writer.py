@@ -0,0 +1,82 @@
+import sqlite3
+from datetime import datetime, timedelta
+from log_writer import ParkingLogWriter, SQLITE_CREATE_TABLE_SQL, parking_row
+
+START = datetime(2024, 5, 1, 8, 0)
+
+
+def make_writer(tmp_path, state):
+    # state['up'] decide si la "base de datos" acepta conexiones
+    db = str(tmp_path / 'parking.db')
+
+    def connect():
+        if not state['up']:
+            raise sqlite3.OperationalError("base de datos caída")
+        return sqlite3.connect(db)
+
+    writer = ParkingLogWriter(connect, str(tmp_path / 'journal.jsonl'), retry_interval=0.0,
+                              placeholder='?', setup_sql=SQLITE_CREATE_TABLE_SQL)
+    return writer, db
+
+
+def stored(db):
+    with sqlite3.connect(db) as conn:
+        return sorted(row[0] for row in conn.execute('SELECT space_number FROM parking_log'))
+
+
+def row(space_number, minutes=30):
+    return parking_row(space_number, START, START + timedelta(minutes=minutes))
+
+
+def test_flush_writes_rows(tmp_path):
+    writer, db = make_writer(tmp_path, {'up': True})
+    writer.flush([row(1), row(2)])
+    assert stored(db) == [1, 2]
+    assert writer.written == 2 and writer.journaled == 0
+    assert not (tmp_path / 'journal.jsonl').exists()
+
+
+def test_rows_are_journaled_while_down_and_replayed(tmp_path):
+    state = {'up': False}
+    writer, db = make_writer(tmp_path, state)
+    writer.flush([row(1), row(2)])
+    assert writer.journaled == 2
+    assert len((tmp_path / 'journal.jsonl').read_text().splitlines()) == 2
+
+    state['up'] = True
+    writer.flush([row(3)])
+    assert stored(db) == [1, 2, 3]
+    assert not (tmp_path / 'journal.jsonl').exists()
+
+
+def test_rejected_row_does_not_block_the_rest(tmp_path):
+    writer, db = make_writer(tmp_path, {'up': True})
+    bad = (None,) + row(9)[1:]  # space_number NOT NULL: la base de datos rechaza solo esta fila
+    writer.flush([row(1), bad, row(2)])
+    assert stored(db) == [1, 2]
+    assert writer.rejected == 1
+
+    # Se reintenta en cada flush y, tras max_attempts rechazos, pasa a descartes
+    for _ in range(writer.max_attempts - 1):
+        writer.flush([row(3)])
+    assert stored(db) == [1, 2, 3, 3]
+    assert not (tmp_path / 'journal.jsonl').exists()
+    assert len((tmp_path / 'journal.jsonl.dead').read_text().splitlines()) == 1
+    assert writer.dead == 1
+
+
+def test_tokens_are_released_once_rows_are_safe(tmp_path):
+    state = {'up': False}
+    writer, db = make_writer(tmp_path, state)
+    writer.log(1, START, START + timedelta(minutes=5), token='a')
+    assert writer.take_durable() == []  # Todavía en la cola, en memoria
+
+    # Sin base de datos la fila queda en el diario: ya está a salvo en disco
+    writer.stop()
+    assert writer.take_durable() == ['a']
+
+    state['up'] = True
+    writer.log(2, START, START + timedelta(minutes=5), token='b')
+    writer.stop()
+    assert writer.take_durable() == ['b']
+    assert stored(db) == [1, 2]
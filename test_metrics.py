@@ -0,0 +1,33 @@
+import urllib.request
+from metrics import MetricsRegistry, MetricsServer, _format_labels
+
+
+def test_label_values_are_escaped():
+    labels = {'camera': 'lote "a"\\norte\nb'}
+    assert _format_labels(labels) == '{camera="lote \\"a\\"\\\\norte\\nb"}'
+
+
+def test_server_scrape():
+    registry = MetricsRegistry()
+    frames = registry.counter('frames_total', "Fotogramas procesados", {'camera': 'lote_a'})
+    registry.gauge('spaces_free', "Espacios libres", fn=lambda: 7)
+    latency = registry.histogram('inference_seconds', "Latencia", buckets=(0.1, 1.0))
+    frames.inc(3)
+    latency.observe(0.05)
+
+    server = MetricsServer(registry, host='127.0.0.1', port=0).start()
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics', timeout=5) as response:
+            assert response.status == 200
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            body = response.read().decode('utf-8')
+    finally:
+        server.stop()
+
+    lines = body.splitlines()
+    assert '# TYPE parking_frames_total counter' in lines
+    assert 'parking_frames_total{camera="lote_a"} 3' in lines
+    assert 'parking_spaces_free 7' in lines
+    assert 'parking_inference_seconds_bucket{le="0.1"} 1' in lines
+    assert 'parking_inference_seconds_bucket{le="+Inf"} 1' in lines
+    assert 'parking_inference_seconds_count 1' in lines
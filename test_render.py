@@ -0,0 +1,46 @@
+import numpy as np
+from bench_occupancy import synthetic_lot
+from bench_pipeline import synthetic_frame
+from render import SpaceRenderer
+
+
+# Fotogramas con llegadas y salidas al azar; devuelve el renderer, el último fotograma dibujado
+# y el estado final para comparar contra un renderer nuevo
+def run(n_spaces, timer_budget, frames=40):
+    pos_list = synthetic_lot(n_spaces)
+    img = synthetic_frame(pos_list)
+    rng = np.random.default_rng(1)
+    occupied = rng.random(n_spaces) < 0.5
+    start_times = np.where(occupied, rng.uniform(0, 999, n_spaces), np.nan)
+    renderer = SpaceRenderer(pos_list, img.shape, timer_budget=timer_budget)
+    now = 1000.0
+    renderer.draw(img.copy(), occupied, start_times, now)
+    for k in range(1, frames):
+        occupied = occupied ^ (rng.random(n_spaces) < 0.05)
+        start_times = np.where(occupied, np.where(np.isnan(start_times), now, start_times), np.nan)
+        now += 0.37
+        out = renderer.draw(img.copy(), occupied, start_times, now)
+    return renderer, img, out, occupied, start_times, now
+
+
+def test_incremental_layers_match_a_fresh_render():
+    renderer, img, out, occupied, start_times, now = run(300, timer_budget=10 ** 9)
+    expected = SpaceRenderer(renderer.pos_list, img.shape).draw(img.copy(), occupied, start_times, now)
+    assert np.array_equal(out, expected)
+
+
+def test_deferred_timers_catch_up():
+    renderer, img, out, occupied, start_times, now = run(300, timer_budget=8)
+    assert renderer.timer_budget == 8
+    for _ in range(60):
+        out = renderer.draw(img.copy(), occupied, start_times, now)
+    expected = SpaceRenderer(renderer.pos_list, img.shape).draw(img.copy(), occupied, start_times, now)
+    assert np.array_equal(out, expected)
+
+
+def test_pixels_outside_the_spaces_are_untouched():
+    renderer, img, out, *_ = run(36, timer_budget=None, frames=5)
+    x0, y0, x1, y1 = renderer.bounds
+    outside = np.ones(img.shape[:2], bool)
+    outside[y0:y1, x0:x1] = False
+    assert np.array_equal(out[outside], img[outside])
@@ -0,0 +1,49 @@
+import numpy as np
+from smoothing import OccupancyFilter, replay, count_transitions
+
+
+# Primer fotograma en que el espacio 0 aparece ocupado / libre después de estar ocupado
+def first(sequence, value, after=0):
+    return after + int(np.argmax(sequence[after:, 0] == value))
+
+
+def test_low_confidence_car_becomes_occupied_after_enter_frames():
+    # Un auto detectado justo sobre el umbral del detector (0.25 < 0.5 de antes)
+    smoothed = replay(np.full((5, 1), 0.3))
+    assert not smoothed[0, 0]
+    assert smoothed[1:, 0].all()
+
+
+def test_exit_after_exit_frames_below_threshold():
+    raw = np.concatenate([np.full(5, 0.3), np.zeros(8)])[:, None]
+    smoothed = replay(raw)
+    # EMA al salir: 0.15, 0.075, 0.0375, ... Bajo 0.1 desde el fotograma 6; libre tras 4 seguidos
+    assert smoothed[1:9, 0].all()
+    assert first(smoothed, False, after=1) == 9
+
+
+def test_single_missed_detection_keeps_space_occupied():
+    raw = np.array([0.8, 0.8, 0.8, 0.0, 0.8, 0.8])[:, None]
+    smoothed = replay(raw)
+    assert first(smoothed, True) == 1
+    assert smoothed[1:, 0].all()
+    assert count_transitions(smoothed) == 1
+
+
+def test_single_spurious_detection_does_not_occupy():
+    raw = np.array([0.0, 0.0, 0.9, 0.0, 0.0, 0.0])[:, None]
+    assert not replay(raw).any()
+
+
+def test_spaces_are_filtered_independently():
+    raw = np.array([[0.9, 0.0], [0.9, 0.0], [0.0, 0.9], [0.0, 0.9]])
+    smoothed = replay(raw, enter_frames=1, exit_frames=1, alpha=1.0)
+    assert smoothed.tolist() == [[True, False], [True, False], [False, True], [False, True]]
+
+
+def test_reindex_keeps_state_of_remaining_spaces():
+    space_filter = OccupancyFilter(3)
+    space_filter.set_occupied([1])
+    space_filter.reindex([1, -1])
+    assert space_filter.occupied.tolist() == [True, False]
+    assert space_filter.update([0.9, 0.0]).tolist() == [True, False]
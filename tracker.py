@@ -0,0 +1,157 @@
+import time
+import numpy as np
+from occupancy import box_centers, lookup_spaces
+
+# Seguimiento liviano de vehículos entre inferencias (asociación por IoU en dos etapas, al
+# estilo ByteTrack): primero se asocian las detecciones de confianza alta y luego las de
+# confianza baja con las pistas que quedaron libres, así un auto estacionado que el modelo
+# ve con poca confianza en un fotograma no pierde su pista. Cada pista recuerda en qué
+# espacio está su centro y desde cuándo; un espacio solo cuenta como ocupado cuando una
+# pista permaneció en él al menos `min_dwell` segundos, así un auto que cruza el
+# estacionamiento no abre sesiones en los espacios por los que pasa.
+
+
+# Matriz (N, M) de IoU entre dos conjuntos de cajas x1, y1, x2, y2
+def iou_matrix(a, b):
+    a = np.asarray(a, np.float32).reshape(-1, 4)
+    b = np.asarray(b, np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+# Asociación codiciosa por mejor pareja mutua: en cada ronda se aceptan a la vez todos los
+# pares (fila, columna) que son el mejor uno del otro. Devuelve (filas, columnas) asociadas.
+def match_pairs(scores, threshold):
+    scores = np.where(scores >= threshold, scores, 0.0)
+    rows, cols = [], []
+    while scores.size and scores.max() > 0:
+        best_col = scores.argmax(axis=1)
+        best_row = scores.argmax(axis=0)
+        r = np.arange(len(scores))
+        mutual = (best_row[best_col] == r) & (scores[r, best_col] > 0)
+        rows.append(r[mutual])
+        cols.append(best_col[mutual])
+        scores[r[mutual], :] = 0
+        scores[:, best_col[mutual]] = 0
+    if not rows:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+class IoUTracker:
+    def __init__(self, iou_threshold=0.3, high_conf=0.5, low_conf=0.1, max_age=10, min_hits=2):
+        self.iou_threshold = iou_threshold
+        self.high_conf = high_conf    # Las detecciones sobre este valor pueden crear pistas
+        self.low_conf = low_conf      # Las detecciones entre low_conf y high_conf solo continúan pistas
+        self.max_age = max_age        # Actualizaciones sin detección antes de borrar una pista
+        self.min_hits = min_hits      # Detecciones necesarias para confirmar una pista
+        self.reset()
+
+    def reset(self):
+        self._next_id = 1
+        self.boxes = np.zeros((0, 4), np.float32)
+        self.confidences = np.zeros(0, np.float32)
+        self.ids = np.zeros(0, np.int64)
+        self.hits = np.zeros(0, np.int32)
+        self.misses = np.zeros(0, np.int32)
+        self.spaces = np.zeros(0, np.int64)         # Espacio donde está el centro de la pista (-1: ninguno)
+        self.space_since = np.zeros(0, np.float64)  # Desde cuándo está en ese espacio
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Pistas confirmadas como arreglo (K, 6): x1, y1, x2, y2, confianza, id
+    def tracks(self):
+        confirmed = self.hits >= self.min_hits
+        return np.column_stack([self.boxes[confirmed], self.confidences[confirmed],
+                                self.ids[confirmed].astype(np.float32)]).astype(np.float32).reshape(-1, 6)
+
+    # Asociar las detecciones (M, 6) de un fotograma con las pistas existentes
+    def update(self, detections, now=None):
+        now = time.time() if now is None else now
+        detections = np.asarray(detections, np.float32).reshape(-1, 6)
+        conf = detections[:, 4]
+        high = np.flatnonzero(conf >= self.high_conf)
+        low = np.flatnonzero((conf >= self.low_conf) & (conf < self.high_conf))
+
+        # Etapa 1: todas las pistas contra las detecciones de confianza alta
+        t1, d1 = match_pairs(iou_matrix(self.boxes, detections[high, :4]), self.iou_threshold)
+        matched_tracks = t1
+        matched_dets = high[d1]
+
+        # Etapa 2: pistas sin asociar contra las detecciones de confianza baja
+        free_tracks = np.setdiff1d(np.arange(len(self.ids)), t1)
+        t2, d2 = match_pairs(iou_matrix(self.boxes[free_tracks], detections[low, :4]), self.iou_threshold)
+        matched_tracks = np.concatenate([matched_tracks, free_tracks[t2]])
+        matched_dets = np.concatenate([matched_dets, low[d2]])
+
+        # Actualizar las pistas asociadas y envejecer las demás
+        self.misses += 1
+        self.boxes[matched_tracks] = detections[matched_dets, :4]
+        self.confidences[matched_tracks] = conf[matched_dets]
+        self.hits[matched_tracks] += 1
+        self.misses[matched_tracks] = 0
+
+        # Las detecciones de confianza alta sin pista inician pistas nuevas
+        new = np.setdiff1d(high, matched_dets)
+        n_new = len(new)
+        self.boxes = np.concatenate([self.boxes, detections[new, :4]])
+        self.confidences = np.concatenate([self.confidences, conf[new]])
+        self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + n_new)])
+        self.hits = np.concatenate([self.hits, np.ones(n_new, np.int32)])
+        self.misses = np.concatenate([self.misses, np.zeros(n_new, np.int32)])
+        self.spaces = np.concatenate([self.spaces, np.full(n_new, -1, np.int64)])
+        self.space_since = np.concatenate([self.space_since, np.full(n_new, now)])
+        self._next_id += n_new
+
+        # Borrar las pistas que llevan demasiadas actualizaciones sin detección
+        alive = self.misses <= self.max_age
+        if not alive.all():
+            for name in ('boxes', 'confidences', 'ids', 'hits', 'misses', 'spaces', 'space_since'):
+                setattr(self, name, getattr(self, name)[alive])
+        return self.tracks()
+
+    # Pistas confirmadas (K, 6) que permanecieron al menos min_dwell segundos en el mismo
+    # espacio del mapa de etiquetas; el resto de las columnas igual que tracks()
+    def dwelling(self, label_map, min_dwell, now=None):
+        now = time.time() if now is None else now
+        spaces = lookup_spaces(label_map, box_centers(self.boxes))
+        moved = spaces != self.spaces
+        self.space_since[moved] = now
+        self.spaces = spaces
+
+        settled = ((self.hits >= self.min_hits) & (spaces >= 0)
+                   & (now - self.space_since >= min_dwell))
+        return np.column_stack([self.boxes[settled], self.confidences[settled],
+                                self.ids[settled].astype(np.float32)]).astype(np.float32).reshape(-1, 6)
+
+
+# Medir el tiempo por actualización con cientos de pistas
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tiempo de asociación del seguidor por IoU")
+    parser.add_argument('--tracks', type=int, default=300)
+    parser.add_argument('--frames', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    origins = rng.uniform(0, 4000, (args.tracks, 2)).astype(np.float32)
+    sizes = rng.uniform(40, 120, (args.tracks, 2)).astype(np.float32)
+    tracker = IoUTracker()
+    start = time.perf_counter()
+    for frame in range(args.frames):
+        jitter = rng.normal(0, 2, (args.tracks, 2)).astype(np.float32)
+        boxes = np.hstack([origins + jitter, origins + jitter + sizes])
+        conf = rng.uniform(0.2, 0.95, (args.tracks, 1)).astype(np.float32)
+        detections = np.hstack([boxes, conf, np.full((args.tracks, 1), 2, np.float32)])
+        tracker.update(detections, now=frame * 0.1)
+    elapsed = (time.perf_counter() - start) / args.frames
+    print(f"{args.tracks} pistas: {elapsed * 1000:.2f} ms por actualización, {len(tracker)} pistas activas")